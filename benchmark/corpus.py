@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""A generated corpus of realistic Anki fields.
+
+The corpus is generated from a fixed seed, so that benchmark runs are
+reproducible and don't need network access or a real collection.
+"""
+import random
+from typing import Callable, Dict, List, Tuple
+
+WORDS: Dict[str, List[str]] = {
+    'en': [
+        'the', 'of', 'and', 'information', 'hyphenation', 'development',
+        'government', 'international', 'university', 'responsibility',
+        'particularly', 'environment', 'understanding', 'relationship',
+        'communication', 'organization', 'significant', 'performance',
+        'technology', 'independent', 'population', 'experience', 'language',
+        'dictionary', 'knowledge', 'question', 'important', 'remember',
+        'digitalization', 'algorithm', 'function', 'decision', 'format'
+    ],
+    'de': [
+        'der', 'die', 'und', 'Kinder', 'Entwicklung', 'Regierung',
+        'Verantwortung', 'Wissenschaft', 'Beziehung', 'Gesellschaft',
+        'Umweltschutz', 'Bundesrepublik', 'Wirtschaft', 'Erfahrung',
+        'Geschwindigkeit', 'Unabhängigkeit', 'Bevölkerung', 'Sprache',
+        'Wörterbuch', 'wahrscheinlich', 'Möglichkeit', 'Zusammenarbeit',
+        'Schmetterling', 'Frühstück', 'Krankenhaus', 'Straßenbahn'
+    ],
+    'pl': [
+        'i', 'w', 'się', 'przekleństwem', 'zasobów', 'rozwój', 'rząd',
+        'odpowiedzialność', 'uniwersytet', 'społeczeństwo', 'środowisko',
+        'gospodarka', 'doświadczenie', 'niepodległość', 'ludność', 'język',
+        'słownik', 'prawdopodobnie', 'możliwość', 'współpraca', 'motyl',
+        'śniadanie', 'szpital', 'tramwaj', 'zrozumienie', 'informacja'
+    ],
+}
+
+LANGUAGES = sorted(WORDS)
+
+
+def sentence(rng: random.Random, lang: str, length: int) -> str:
+    words = [rng.choice(WORDS[lang]) for _ in range(length)]
+    words[0] = words[0].capitalize()
+    return ' '.join(words) + rng.choice(['.', '.', '!', '?'])
+
+
+def plain_text_field(rng: random.Random, lang: str) -> str:
+    """Generates a markup-free field: a word, a phrase or a few sentences."""
+    kind = rng.random()
+    if kind < 0.4:
+        return rng.choice(WORDS[lang])
+    if kind < 0.7:
+        return ' '.join(rng.choice(WORDS[lang]) for _ in range(3))
+    return ' '.join(
+        sentence(rng, lang, rng.randint(6, 14))
+        for _ in range(rng.randint(1, 4)))
+
+
+FORMULA_WORDS = [
+    r'\frac{\partial}{\partial t}', r'\text{probability}', r'\sum_{i=1}^{n}',
+    r'\text{expectation}', r'\mathrm{variance}', r'\int_0^\infty',
+    r'\text{distribution}', r'\operatorname{argmax}'
+]
+
+
+def formula(rng: random.Random) -> str:
+    """Generates a long MathJax formula full of hyphenatable words."""
+    body = ' + '.join(rng.choice(FORMULA_WORDS) for _ in range(12))
+    if rng.random() < 0.5:
+        return r'\(' + body + r'\)'
+    return r'\[' + body + r'\]'
+
+
+def mathjax_text(formulas: int, seed: int = 0) -> str:
+    """Generates English lecture notes with the given number of formulas."""
+    rng = random.Random(seed)
+    return ' '.join(
+        sentence(rng, 'en', 8) + ' ' + formula(rng) for _ in range(formulas))
+
+
+def plain_text_fields(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [plain_text_field(rng, rng.choice(LANGUAGES)) for _ in range(count)]
+
+
+def rich_html_field(rng: random.Random, lang: str) -> str:
+    """Generates a field formatted in Anki's editor."""
+    parts = []
+    for _ in range(rng.randint(2, 6)):
+        text = sentence(rng, lang, rng.randint(4, 10))
+        tag = rng.choice(['b', 'i', 'u', 'span', None])
+        if tag == 'span':
+            text = '<span style="color: rgb(255, 0, 0);">{}</span>'.format(
+                text)
+        elif tag:
+            text = '<{0}>{1}</{0}>'.format(tag, text)
+        parts.append(text)
+    return '<div>{}</div>'.format('&nbsp;<br>'.join(parts))
+
+
+def cloze_field(rng: random.Random, lang: str) -> str:
+    """Generates a cloze deletion field with a few gaps and hints."""
+    words = [rng.choice(WORDS[lang]) for _ in range(rng.randint(8, 20))]
+    gaps = rng.randint(1, 3)
+    for i, position in enumerate(rng.sample(range(len(words)), gaps), 1):
+        hint = '::' + rng.choice(WORDS[lang]) if rng.random() < 0.3 else ''
+        words[position] = '{{{{c{:d}::{}{}}}}}'.format(i, words[position],
+                                                       hint)
+    return ' '.join(words) + '.'
+
+
+def mathjax_field(rng: random.Random, lang: str) -> str:
+    """Generates a field that mixes prose and MathJax formulas."""
+    return ' '.join(
+        sentence(rng, lang, 6) + ' ' + formula(rng)
+        for _ in range(rng.randint(1, 3)))
+
+
+def table_field(rng: random.Random, lang: str) -> str:
+    """Generates a table of short cells, e.g., a conjugation table."""
+    rows = []
+    for _ in range(rng.randint(3, 8)):
+        cells = ''.join('<td>{}</td>'.format(rng.choice(WORDS[lang]))
+                        for _ in range(rng.randint(2, 4)))
+        rows.append('<tr>{}</tr>'.format(cells))
+    return '<table><tbody>{}</tbody></table>'.format(''.join(rows))
+
+
+FIELD_KINDS: Dict[str, Callable[[random.Random, str], str]] = {
+    'plain text': plain_text_field,
+    'rich html': rich_html_field,
+    'cloze': cloze_field,
+    'mathjax': mathjax_field,
+    'table': table_field,
+}
+
+
+def fields(count: int, seed: int = 0) -> List[Tuple[str, str, str]]:
+    """Generates fields of all kinds in all languages.
+
+    Returns:
+        (kind, langdetect language, field) triples.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        kind = sorted(FIELD_KINDS)[i % len(FIELD_KINDS)]
+        lang = rng.choice(LANGUAGES)
+        corpus.append((kind, lang, FIELD_KINDS[kind](rng, lang)))
+    return corpus
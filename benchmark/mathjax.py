@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Compares MathJax protection in `hyphenate_end_node` with the old approach.
+
+The old approach inserted soft hyphens everywhere and then removed them from
+formulas one at a time, rescanning the whole text after each removal.
+
+Usage: python -m benchmark.mathjax
+"""
+import re
+import timeit
+
+from benchmark.corpus import mathjax_text
+from wordhyphenator.main import SHY, dictionary_pool, hyphenate_end_node
+
+
+def legacy_hyphenate_end_node(dic, text: str) -> str:
+    output = ''.join(
+        dic.inserted(chunk, SHY) if i % 2 else chunk
+        for i, chunk in enumerate(re.split(r'(\b\w+\b)', text)))
+
+    find_hyphen_in_mathjax = r'\\\((.*?)' + SHY + r'(.*?)\\\)'
+    while re.search(find_hyphen_in_mathjax, output):
+        output = re.sub(find_hyphen_in_mathjax, r'\(\1\2\)', output)
+
+    find_hyphen_in_mathjax = r'\\\[(.*?)' + SHY + r'(.*?)\\\]'
+    while re.search(find_hyphen_in_mathjax, output):
+        output = re.sub(find_hyphen_in_mathjax, r'\[\1\2\]', output)
+
+    return output
+
+
+def main() -> None:
+    dic = dictionary_pool.get('en_US')
+    for formulas in [5, 20, 80]:
+        text = mathjax_text(formulas)
+        legacy_time = min(
+            timeit.repeat(lambda: legacy_hyphenate_end_node(dic, text),
+                          number=1,
+                          repeat=3))
+        new_time = min(
+            timeit.repeat(lambda: hyphenate_end_node(dic, text),
+                          number=1,
+                          repeat=3))
+        print('{:d} formulas, {:d} characters: legacy {:.4f}s, '
+              'single pass {:.4f}s, {:.1f}x'.format(formulas, len(text),
+                                                    legacy_time, new_time,
+                                                    legacy_time / new_time))
+
+
+if __name__ == '__main__':
+    main()
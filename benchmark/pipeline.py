@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Measures time and memory of each stage of the hyphenation pipeline.
+
+The stages run over a generated corpus of plain text, rich HTML, cloze,
+MathJax and table fields in several languages. Caches are cleared before each
+run, so every run does the same work. Results can be saved as JSON and later
+runs compared against them to catch regressions before a release.
+
+Usage:
+    python -m benchmark.pipeline --save baseline.json
+    python -m benchmark.pipeline --compare baseline.json
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from benchmark.corpus import LANGUAGES, fields
+from wordhyphenator import main as hyphenator
+from wordhyphenator.main import (chunkify, detected_languages, dictionary_pool,
+                                 hyphenate, hyphenate_end_node,
+                                 hyphenate_field, hyphenated_fields,
+                                 resolve_language, word_cache)
+
+Field = Tuple[str, str, str]
+
+
+@contextlib.contextmanager
+def configured(**settings) -> Iterator[None]:
+    """Temporarily overrides the add-on configuration."""
+    config = hyphenator.config
+    hyphenator.config = dict(config or {}, **settings)
+    try:
+        yield
+    finally:
+        hyphenator.config = config
+
+
+def with_config(func: Callable[[str, str], object],
+                **settings) -> Callable[[str, str], object]:
+
+    def run(field: str, lang: str) -> object:
+        with configured(**settings):
+            return func(field, lang)
+
+    return run
+
+
+# Each stage takes a field and its Pyphen language.
+STAGES: Dict[str, Callable[[str, str], object]] = {
+    'chunkify':
+    lambda field, lang: chunkify(field),
+    'hyphenate_end_node':
+    lambda field, lang: hyphenate_end_node(dictionary_pool.get(lang), field),
+    'hyphenate':
+    hyphenate,
+    'hyphenate_field (beautifulsoup)':
+    with_config(hyphenate_field, html_engine='beautifulsoup'),
+    'hyphenate_field (streaming)':
+    with_config(hyphenate_field, html_engine='streaming'),
+    'hyphenate_field (detected language)':
+    lambda field, lang: hyphenate_field(field),
+}
+
+
+def clear_caches() -> None:
+    word_cache.clear()
+    hyphenated_fields.clear()
+    detected_languages.clear()
+
+
+def run_stage(stage: Callable[[str, str], object],
+              corpus: List[Field]) -> Dict[str, float]:
+    """Returns the time in seconds that the stage spent on each field kind."""
+    times: Dict[str, float] = {}
+    for kind, lang, field in corpus:
+        start = time.perf_counter()
+        stage(field, resolve_language(lang))
+        times[kind] = times.get(kind, 0.0) + time.perf_counter() - start
+    return times
+
+
+def time_stage(stage: Callable[[str, str], object], corpus: List[Field],
+               repeat: int) -> Dict[str, float]:
+    """Returns the best time of each field kind over the runs."""
+    best: Dict[str, float] = {}
+    for _ in range(repeat):
+        clear_caches()
+        for kind, seconds in run_stage(stage, corpus).items():
+            best[kind] = min(best.get(kind, seconds), seconds)
+    return best
+
+
+def measure_peak_memory(stage: Callable[[str, str], object],
+                        corpus: List[Field]) -> int:
+    """Returns the peak memory in bytes allocated while running the stage."""
+    clear_caches()
+    tracemalloc.start()
+    try:
+        run_stage(stage, corpus)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(corpus: List[Field], repeat: int) -> Dict[str, Dict]:
+    """Runs all stages over the corpus.
+
+    Returns:
+        A map from stage names to microseconds per field of each kind,
+        microseconds per field overall and peak memory in KiB.
+    """
+    counts: Dict[str, int] = {}
+    for kind, _, _ in corpus:
+        counts[kind] = counts.get(kind, 0) + 1
+    results = {}
+    for name, stage in STAGES.items():
+        times = time_stage(stage, corpus, repeat)
+        results[name] = {
+            'us_per_field': {
+                kind: 1e6 * seconds / counts[kind]
+                for kind, seconds in sorted(times.items())
+            },
+            'total_us_per_field': 1e6 * sum(times.values()) / len(corpus),
+            'peak_memory_kib': measure_peak_memory(stage, corpus) / 1024,
+        }
+    return results
+
+
+def print_results(results: Dict[str, Dict]) -> None:
+    kinds = sorted(next(iter(results.values()))['us_per_field'])
+    print('µs per field:')
+    print('{:36s}'.format('') + ''.join('{:>12s}'.format(kind)
+                                        for kind in kinds + ['all']) +
+          '{:>12s}'.format('peak KiB'))
+    for name, result in results.items():
+        print('{:36s}'.format(name) +
+              ''.join('{:12.1f}'.format(result['us_per_field'][kind])
+                      for kind in kinds) +
+              '{:12.1f}{:12.1f}'.format(result['total_us_per_field'],
+                                        result['peak_memory_kib']))
+
+
+def find_regressions(results: Dict[str, Dict], baseline: Dict[str, Dict],
+                     tolerance: float) -> List[str]:
+    """Lists stages that became slower than the baseline by over tolerance."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['total_us_per_field']
+        after = result['total_us_per_field']
+        if after > before * (1 + tolerance):
+            regressions.append('{}: {:.1f}µs -> {:.1f}µs per field'.format(
+                name, before, after))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--fields', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='Saves results to this JSON file.')
+    parser.add_argument('--compare',
+                        help='Compares results with this JSON file.')
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=0.2,
+                        help='Allowed slowdown relative to --compare.')
+    args = parser.parse_args(argv)
+
+    corpus = fields(args.fields, args.seed)
+    dictionary_pool.warm_up(resolve_language(lang) for lang in LANGUAGES)
+    print('{:d} fields, {:d} characters, best of {:d} runs'.format(
+        len(corpus), sum(len(field) for _, _, field in corpus), args.repeat))
+    results = benchmark(corpus, args.repeat)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = find_regressions(results, json.load(f),
+                                           args.tolerance)
+        for regression in regressions:
+            print('Regression in ' + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Compares the plain text fast path of `hyphenate_field` with the HTML path.
+
+Usage: python -m benchmark.plain_text
+"""
+import timeit
+from typing import Callable, List, Optional
+
+from benchmark.corpus import plain_text_fields
+from wordhyphenator.main import (detected_languages, hyphenate_html_field,
+                                 hyphenate_plain_text_field, is_plain_text,
+                                 word_cache)
+
+
+def clear_caches() -> None:
+    word_cache.clear()
+    detected_languages.clear()
+
+
+def time_pass(hyphenate: Callable[[str, Optional[str]], str],
+              fields: List[str], lang: Optional[str], repeat: int) -> float:
+    """Returns the best time of hyphenating all fields in seconds.
+
+    Caches are cleared before each pass, so that a pass doesn't reuse words
+    and languages of the previous one.
+    """
+    return min(
+        timeit.repeat(lambda: [hyphenate(field, lang) for field in fields],
+                      setup=clear_caches,
+                      number=1,
+                      repeat=repeat))
+
+
+def main() -> None:
+    fields = plain_text_fields(count=2000)
+    assert all(is_plain_text(field) for field in fields)
+    print('{:d} plain text fields'.format(len(fields)))
+    # A fixed language isolates parsing costs, with detection the speedup is
+    # diluted by langdetect.
+    for lang, repeat in [('en_US', 5), (None, 1)]:
+        html_time = time_pass(hyphenate_html_field, fields, lang, repeat)
+        plain_time = time_pass(hyphenate_plain_text_field, fields, lang,
+                               repeat)
+        print('language={}: html {:.3f}s, plain text {:.3f}s, {:.1f}x'.format(
+            lang or 'detected', html_time, plain_time, html_time / plain_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Measures how much the add-on adds to Anki's startup.
+
+Each measurement runs in a fresh interpreter that has already imported anki
+and aqt, so only the add-on's own cost is measured. The deferred cost is what
+the first hyphenation pays instead: importing bs4, langdetect and pyphen and
+loading langdetect's profiles.
+
+Usage: python -m benchmark.startup
+"""
+import statistics
+import subprocess
+import sys
+
+MEASURE = '''
+import time
+import anki, aqt
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+'''
+
+IMPORT_ADDON = 'import wordhyphenator'
+FIRST_HYPHENATION = ('import wordhyphenator\n'
+                     'wordhyphenator.main.hyphenate_field("<b>word</b>")')
+
+
+def measure(code: str, runs: int) -> float:
+    """Returns the median time of running the code in a fresh interpreter."""
+    times = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c',
+             MEASURE.format(code=code)],
+            check=True,
+            capture_output=True,
+            text=True).stdout
+        times.append(float(output))
+    return statistics.median(times)
+
+
+def main() -> None:
+    runs = 5
+    print('import wordhyphenator: {:.3f}s'.format(measure(IMPORT_ADDON, runs)))
+    print('import and first hyphenation: {:.3f}s'.format(
+        measure(FIRST_HYPHENATION, runs)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Unit tests for the batch module."""
+import unittest
+
+from wordhyphenator.batch import BatchHyphenator, hyphenate_fields
+from wordhyphenator.main import hyphenate_field, hyphenated_fields
+
+
+class BatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fields = [
+            '<b>hyphenation</b> {:d}'.format(i) if i %
+            2 else 'digitalization {:d}'.format(i) for i in range(50)
+        ]
+        self.langs = ['en_US'] * len(self.fields)
+
+    def test_hyphenate_fields_keeps_the_order_of_fields(self):
+        self.assertListEqual(
+            hyphenate_fields(self.fields, self.langs, workers=2, chunk_size=7),
+            [hyphenate_field(field, 'en_US') for field in self.fields])
+
+    def test_remembers_results_of_workers(self):
+        hyphenated_fields.clear()
+        new_fields = hyphenate_fields(self.fields,
+                                      self.langs,
+                                      workers=2,
+                                      chunk_size=7)
+        for new_field in new_fields:
+            self.assertIn((new_field, 'en_US'), hyphenated_fields)
+
+    def test_single_worker_hyphenates_in_process(self):
+        with BatchHyphenator(workers=1, chunk_size=7) as hyphenator:
+            self.assertListEqual(
+                hyphenator.hyphenate_fields(self.fields, self.langs),
+                [hyphenate_field(field, 'en_US') for field in self.fields])
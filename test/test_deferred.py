@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Unit tests for the deferred module."""
+import functools
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+
+from anki import hooks  # type: ignore
+from anki.collection import Collection  # type: ignore
+
+from wordhyphenator import deferred
+from wordhyphenator.deferred import (UNDO_LABEL, DeferredHyphenator,
+                                     PendingNotes, hyphenate_stored_notes,
+                                     on_note_will_flush,
+                                     write_hyphenated_notes)
+from wordhyphenator.main import is_writing_notes
+
+
+class PendingNotesTestCase(unittest.TestCase):
+
+    def test_coalesces_repeated_saves(self):
+        pending = PendingNotes()
+        for note_id in [3, 1, 3, 2, 1]:
+            pending.add(note_id)
+        self.assertEqual(len(pending), 3)
+        self.assertListEqual(pending.take(), [3, 1, 2])
+        self.assertEqual(len(pending), 0)
+
+
+class HyphenateStoredNotesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.col = Collection(
+            os.path.join(self.tmp_dir.name, 'collection.anki2'))
+        basic = self.col.models.by_name('Basic')
+        deck_id = self.col.decks.id('Default')
+        for front in ['first', 'second']:
+            note = self.col.new_note(basic)
+            note['Front'] = front
+            self.col.add_note(note, deck_id)
+        self.note_ids = sorted(self.col.find_notes(''))
+
+    def tearDown(self):
+        self.col.close()
+        self.tmp_dir.cleanup()
+
+    def hyphenate(self, note):
+        if note['Front'] != 'second':
+            return False
+        note['Front'] = 'sec\xadond'
+        return True
+
+    def test_writes_only_changed_notes_without_rescheduling_them(self):
+        deferred_hyphenator = mock.Mock()
+        on_flush = functools.partial(on_note_will_flush, deferred_hyphenator)
+        hooks.note_will_flush.append(on_flush)
+        self.addCleanup(hooks.note_will_flush.remove, on_flush)
+        with mock.patch.object(deferred,
+                               'hyphenate_note',
+                               side_effect=self.hyphenate):
+            notes = hyphenate_stored_notes(self.col, self.note_ids)
+        self.assertListEqual([note.id for note in notes], self.note_ids[1:])
+
+        out = write_hyphenated_notes(self.col, notes)
+
+        self.assertEqual(out.count, 1)
+        self.assertTrue(out.changes.note_text)
+        self.assertEqual(
+            self.col.get_note(self.note_ids[1])['Front'], 'sec\xadond')
+        deferred_hyphenator.schedule.assert_not_called()
+        self.assertFalse(is_writing_notes())
+
+    def test_write_can_be_undone_separately(self):
+        note = self.col.get_note(self.note_ids[1])
+        note['Back'] = 'edited'
+        self.col.update_note(note)
+        with mock.patch.object(deferred,
+                               'hyphenate_note',
+                               side_effect=self.hyphenate):
+            notes = hyphenate_stored_notes(self.col, self.note_ids[1:])
+        write_hyphenated_notes(self.col, notes)
+
+        self.assertEqual(self.col.undo_status().undo, UNDO_LABEL)
+        self.col.undo()
+        note = self.col.get_note(self.note_ids[1])
+        self.assertEqual(note['Front'], 'second')
+        self.assertEqual(note['Back'], 'edited')
+
+    def test_skips_notes_saved_while_they_were_hyphenated(self):
+        with mock.patch.object(deferred,
+                               'hyphenate_note',
+                               side_effect=self.hyphenate):
+            notes = hyphenate_stored_notes(self.col, self.note_ids[1:])
+        # A save in the meantime, which is at least a second later.
+        self.col.db.execute('update notes set mod = mod + 1 where id = ?',
+                            self.note_ids[1])
+
+        self.assertEqual(write_hyphenated_notes(self.col, notes).count, 0)
+        self.assertEqual(
+            self.col.get_note(self.note_ids[1])['Front'], 'second')
+
+    def test_schedules_saved_notes(self):
+        deferred_hyphenator = mock.Mock()
+        on_note_will_flush(deferred_hyphenator, mock.Mock(id=7))
+        deferred_hyphenator.schedule.assert_called_once_with(7)
+
+
+class DeferredHyphenatorTestCase(unittest.TestCase):
+
+    def test_drain_writes_back_the_running_task(self):
+        mw = mock.Mock()
+        task = Future()
+        mw.taskman.run_in_background.return_value = task
+        deferred_hyphenator = DeferredHyphenator(mw, delay_ms=1000)
+        deferred_hyphenator.schedule(1)
+        deferred_hyphenator._start()
+        notes = [mock.Mock(id=1)]
+        threading.Timer(0.05, task.set_result, [notes]).start()
+        with mock.patch.object(deferred, 'hyphenate_stored_notes',
+                               return_value=[]) as hyphenate,\
+                mock.patch.object(deferred, 'write_hyphenated_notes') as write:
+            deferred_hyphenator.drain()
+            deferred_hyphenator._on_done(task)
+        self.assertTrue(task.done())
+        hyphenate.assert_called_once_with(mw.col, [])
+        write.assert_called_once_with(mw.col, notes)
+
+    def test_writes_back_in_a_collection_operation(self):
+        mw = mock.Mock()
+        task = Future()
+        mw.taskman.run_in_background.return_value = task
+        deferred_hyphenator = DeferredHyphenator(mw, delay_ms=1000)
+        deferred_hyphenator.schedule(1)
+        deferred_hyphenator._start()
+        notes = [mock.Mock(id=1)]
+        task.set_result(notes)
+        with mock.patch.object(deferred, 'CollectionOp') as collection_op:
+            deferred_hyphenator._on_done(task)
+        collection_op.assert_called_once()
+        op = collection_op.call_args[0][1]
+        self.assertIs(op.func, write_hyphenated_notes)
+        self.assertDictEqual(op.keywords, {'notes': notes})
+        collection_op.return_value.run_in_background.assert_called_once()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Unit tests for the lru module."""
+import unittest
+
+from wordhyphenator.lru import MISSING, LruCache
+
+
+class LruCacheTestCase(unittest.TestCase):
+
+    def test_lookup_returns_stored_values(self):
+        cache = LruCache(max_size=2)
+        self.assertIs(cache.lookup('a'), MISSING)
+        cache.store('a', None)
+        self.assertIsNone(cache.lookup('a'))
+        self.assertEqual(cache.lookup('b', 'default'), 'default')
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertAlmostEqual(cache.hit_rate, 1 / 3)
+
+    def test_store_evicts_least_recently_used_entries(self):
+        cache = LruCache(max_size=2)
+        cache.store('a', 1)
+        cache.store('b', 2)
+        cache.lookup('a')
+        cache.store('c', 3)
+        self.assertEqual(cache.lookup('a'), 1)
+        self.assertIs(cache.lookup('b'), MISSING)
+        cache.max_size = 1
+        cache.store('d', 4)
+        self.assertEqual(len(cache), 1)
+
+    def test_zero_size_disables_the_cache(self):
+        cache = LruCache(max_size=0)
+        cache.store('a', 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_clear_removes_entries_and_counters(self):
+        cache = LruCache(max_size=2)
+        cache.store('a', 1)
+        cache.lookup('a')
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
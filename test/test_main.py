@@ -5,12 +5,26 @@ from os import path
 import os
 import tempfile
 import re
+import threading
 import unittest
+from unittest import mock
 
 from bs4 import BeautifulSoup as bs  # type: ignore
 
+import langdetect  # type: ignore
 import pyphen  # type: ignore
-from wordhyphenator.main import chunkify, hyphenate, hyphenate_end_node, use_minimal_html_formatting
+from anki import hooks  # type: ignore
+from anki.collection import Collection  # type: ignore
+from wordhyphenator.main import (
+    DetectedLanguages, DictionaryPool, HyphenatedFields, LazyModule,
+    RenderedSides, ScriptClassifier, WordCache, chunkify, dehyphenate_field,
+    find_language_override, get_config, get_detection_languages,
+    get_detectable_text, hyphenate, hyphenate_end_node, hyphenate_field,
+    hyphenate_field_incrementally, hyphenate_html_field, hyphenate_note,
+    hyphenate_plain_text_field, hyphenate_rendered_side, hyphenate_text,
+    import_langdetect, is_plain_text, is_writing_notes, iter_chunks,
+    on_main_window_did_init, on_note_will_be_added, on_note_will_flush,
+    run_langdetect, set_current_field, use_minimal_html_formatting, warm_up)
 
 
 def get_testdata_dir():
@@ -52,6 +66,20 @@ class HyphenateTestCase(unittest.TestCase):
             chunkify('hello-wordls&nbsp; you did '),
             ['', 'hello', '-', 'wordls', '&nbsp; ', 'you', ' ', 'did', ' '])
 
+    def test_chunkify_without_entities(self):
+        self.assertListEqual(chunkify('hello, world'),
+                             ['', 'hello', ', ', 'world', ''])
+
+    def test_iter_chunks_yields_chunks_lazily(self):
+        chunks = iter_chunks('hello&nbsp;world')
+        self.assertEqual(next(chunks), '')
+        self.assertEqual(next(chunks), 'hello')
+        self.assertListEqual(list(chunks), ['&nbsp;', 'world', ''])
+
+    def test_chunkify_keeps_mathjax_in_non_word_chunks(self):
+        self.assertListEqual(chunkify(r'a \(x + y\) b \[z\]'),
+                             ['', 'a', r' \(x + y\) ', 'b', r' \[z\]'])
+
     def test_hyphenate_doesnt_add_spurious_whitespace(self):
         self.assertEqual(hyphenate('<q>word</q>'), '<q>word</q>')
 
@@ -66,6 +94,109 @@ class HyphenateTestCase(unittest.TestCase):
                 '{in_file:s} doesn\'t match {out_file:s}.'.format(
                     in_file=in_file, out_file=out_file))
 
+    def test_hyphenate_field(self):
+        for (in_file, out_file) in self.inouts:
+            assertHtmlEqual(
+                self, hyphenate_field(read_file(in_file)), read_file(out_file),
+                '{in_file:s} doesn\'t match {out_file:s}.'.format(
+                    in_file=in_file, out_file=out_file))
+
+    def test_hyphenate_field_uses_minimal_formatting(self):
+        self.assertEqual(
+            hyphenate_field('<img src="berührung">hyphenation', lang='en'),
+            '<img src="berührung"/>hy\xadphen\xadation')
+
+    def test_is_plain_text(self):
+        self.assertTrue(is_plain_text('hyphenation'))
+        self.assertTrue(is_plain_text('a &amp; b&nbsp;c &gt; d'))
+        self.assertFalse(is_plain_text('<b>hyphenation</b>'))
+        self.assertFalse(is_plain_text('a & b'))
+        self.assertFalse(is_plain_text('&#65;'))
+        self.assertFalse(is_plain_text(' \n'))
+
+    def test_plain_text_fields_hyphenate_like_html_fields(self):
+        for field in [
+                'hyphenation', 'hello \\(\\ldots\\) digitalization',
+                'a &amp; b&nbsp;hyphenation &gt; d', '[sound:hyphenation.mp3]',
+                '{{c1::hyphenation}}\n'
+        ]:
+            self.assertEqual(hyphenate_plain_text_field(field, lang='en'),
+                             hyphenate_html_field(field, lang='en'), field)
+
+    def test_hyphenate_field_skips_fields_it_has_hyphenated(self):
+        field = hyphenate_field('<b>hyphenation</b>', lang='en_US')
+        with mock.patch('wordhyphenator.main.hyphenate_html_field',
+                        return_value=field) as html:
+            self.assertEqual(hyphenate_field(field, lang='en_US'), field)
+            html.assert_not_called()
+            hyphenate_field(field, lang='de')
+            html.assert_called_once()
+
+    def test_hyphenate_field_incrementally_hyphenates_changed_text(self):
+        field = hyphenate_field_incrementally(
+            '<div>hyphenation</div><div>information</div>', lang='en_US')
+        self.assertEqual(
+            field,
+            '<div>hy\xadphen\xadation</div><div>in\xadfor\xadma\xadtion</div>')
+        edited = field.replace('</div><div>', '</div><div>digitalization ')
+        with mock.patch('wordhyphenator.main.hyphenate_text',
+                        side_effect=hyphenate_text) as hyphenate_text_mock:
+            self.assertEqual(
+                hyphenate_field_incrementally(edited, lang='en_US'),
+                '<div>hy\xadphen\xadation</div><div>dig\xadi\xadtal\xadiza\xadtion '
+                'in\xadfor\xadma\xadtion</div>')
+        hyphenate_text_mock.assert_called_once()
+
+    def test_dehyphenate_field(self):
+        for engine in ['beautifulsoup', 'streaming']:
+            with mock.patch('wordhyphenator.main.config',
+                            {'html_engine': engine}):
+                self.assertEqual(
+                    dehyphenate_field('<b>hy\xadphen&shy;ation</b>'
+                                      '<pre>pre&shy;formatted</pre>'),
+                    '<b>hyphenation</b><pre>pre\xadformatted</pre>', engine)
+        self.assertEqual(dehyphenate_field('hy&shy;phen\xadation &amp; b'),
+                         'hyphenation &amp; b')
+
+    def test_dehyphenate_field_keeps_fields_without_soft_hyphens(self):
+        field = '<img src="berührung">hyphenation'
+        self.assertIs(dehyphenate_field(field), field)
+
+    def test_dehyphenate_field_reverses_hyphenate_field(self):
+        for (in_file, _) in self.inouts:
+            field = use_minimal_html_formatting(read_file(in_file))
+            self.assertEqual(dehyphenate_field(hyphenate_field(field)),
+                             dehyphenate_field(field), in_file)
+
+    def test_hyphenate_rendered_side_keeps_the_template(self):
+        html = ('<style>.card { hyphens: auto; }</style>'
+                '<div class=card>hyphenation</div>'
+                '<script>var hyphenation = 1;</script>')
+        with mock.patch('wordhyphenator.main.rendered_sides', RenderedSides()):
+            self.assertEqual(
+                hyphenate_rendered_side(html, lang='en_US'),
+                html.replace('>hyphenation<', '>hy\xadphen\xadation<'))
+
+    def test_hyphenate_rendered_side_caches_sides(self):
+        with mock.patch('wordhyphenator.main.rendered_sides', RenderedSides()),\
+                mock.patch('wordhyphenator.main.hyphenate_streaming_field',
+                           return_value='b') as hyphenate_streaming_field:
+            self.assertEqual(hyphenate_rendered_side('a', 'en_US'), 'b')
+            self.assertEqual(hyphenate_rendered_side('a', 'en_US'), 'b')
+            hyphenate_streaming_field.assert_called_once()
+
+    def test_rendered_sides_are_cached_per_language(self):
+        sides = RenderedSides()
+        sides.put('side', 'de', 'de side')
+        self.assertEqual(sides.get('side', 'de'), 'de side')
+        self.assertIsNone(sides.get('side', 'pl'))
+        self.assertIsNone(sides.get('side', None))
+
+    def test_hyphenate_skips_scripts(self):
+        self.assertEqual(
+            hyphenate('<script>hyphenation()</script>', lang='en_US'),
+            '<script>hyphenation()</script>')
+
     def test_hyphenate_a_cloze_with_2_words(self):
         self.assertEqual(
             hyphenate_end_node(pyphen.Pyphen(lang='pl'),
@@ -76,6 +207,22 @@ class HyphenateTestCase(unittest.TestCase):
         self.assertEqual(hyphenate(r'Kinder sind dumm.'),
                          'Kin&shy;der sind dumm.')
 
+    def test_hyphenate_uses_the_given_language(self):
+        self.assertEqual(hyphenate('<b>hyphenation</b>', lang='en_US'),
+                         '<b>hy&shy;phen&shy;ation</b>')
+
+    def test_hyphenate_detects_language_once_per_field(self):
+        self.assertEqual(
+            hyphenate('<b>Kinder</b> sind <i>Menschen</i>.',
+                      detect_per_field=True),
+            '<b>Kin&shy;der</b> sind <i>Men&shy;schen</i>.')
+
+    def test_get_detectable_text_skips_ignored_nodes(self):
+        text = get_detectable_text(
+            bs('<b>a</b>[sound:x.mp3]<pre>b</pre><!--c-->d',
+               features='html.parser'))
+        self.assertListEqual(sorted(text.split('\n')), ['a', 'd'])
+
     def test_dont_hyphenate_round_mathjax_but_hyphenate_the_rest(self):
         # Add hello, so that the algorithm recognizes the text as English.
         self.assertEqual(
@@ -88,6 +235,18 @@ class HyphenateTestCase(unittest.TestCase):
             hyphenate(r'hello \[\ldots\] digitalization').strip(),
             r'hel&shy;lo \[\ldots\] di&shy;gi&shy;ta&shy;li&shy;za&shy;tion')
 
+    def test_hyphenate_words_between_mathjax_formulas(self):
+        self.assertEqual(
+            hyphenate_end_node(pyphen.Pyphen(lang='en_US'),
+                               r'\(a\) hyphenation \(b\)'),
+            '\\(a\\) hy\xadphen\xadation \\(b\\)')
+
+    def test_dont_hyphenate_multiline_mathjax(self):
+        self.assertEqual(
+            hyphenate_end_node(pyphen.Pyphen(lang='en_US'),
+                               '\\[\\text{hyphenation}\n+ 1\\]'),
+            '\\[\\text{hyphenation}\n+ 1\\]')
+
     def test_handle_br(self):
         self.assertEqual(hyphenate('<br>'), '<br>')
 
@@ -104,3 +263,369 @@ class HyphenateTestCase(unittest.TestCase):
         self.assertEqual(
             use_minimal_html_formatting('<img src="ber&uuml;hrung"/>'),
             '<img src="berührung"/>')
+
+    def test_hyphenate_text_skips_text_without_long_words(self):
+        with mock.patch('wordhyphenator.main.detect_language') as detect:
+            for text in [' ', '12.50', '—', 'a an the', '<ok>']:
+                self.assertEqual(hyphenate_text(text), text)
+            detect.assert_not_called()
+
+
+class DictionaryPoolTestCase(unittest.TestCase):
+
+    def test_get_reuses_dictionaries(self):
+        pool = DictionaryPool()
+        self.assertIs(pool.get('pl'), pool.get('pl'))
+        self.assertEqual((pool.hits, pool.misses), (1, 1))
+
+    def test_get_maps_en_to_en_us(self):
+        pool = DictionaryPool()
+        self.assertIs(pool.get('en'), pool.get('en_US'))
+
+    def test_get_raises_key_error_for_unknown_languages(self):
+        pool = DictionaryPool()
+        self.assertRaises(KeyError, pool.get, 'xx')
+        self.assertRaises(KeyError, pool.get, 'xx')
+        self.assertEqual((pool.hits, pool.misses), (1, 1))
+
+    def test_get_evicts_least_recently_used_dictionaries(self):
+        pool = DictionaryPool(max_size=2)
+        pool.warm_up(['pl', 'de', 'pl', 'fr'])
+        self.assertEqual(len(pool), 2)
+        pool.get('pl')
+        self.assertEqual(pool.hits, 2)
+
+
+class WordCacheTestCase(unittest.TestCase):
+
+    def test_get_returns_put_words(self):
+        cache = WordCache()
+        self.assertIsNone(cache.get('pl', 'zasobów'))
+        cache.put('pl', 'zasobów', 'za\xadso\xadbów')
+        self.assertEqual(cache.get('pl', 'zasobów'), 'za\xadso\xadbów')
+        self.assertIsNone(cache.get('de', 'zasobów'))
+        self.assertAlmostEqual(cache.hit_rate, 1 / 3)
+
+    def test_put_evicts_least_recently_used_words(self):
+        cache = WordCache(max_size=2)
+        cache.put('en_US', 'a', 'a')
+        cache.put('en_US', 'b', 'b')
+        cache.get('en_US', 'a')
+        cache.put('en_US', 'c', 'c')
+        self.assertEqual(cache.get('en_US', 'a'), 'a')
+        self.assertIsNone(cache.get('en_US', 'b'))
+
+    def test_zero_size_disables_the_cache(self):
+        cache = WordCache(max_size=0)
+        cache.put('en_US', 'a', 'a')
+        self.assertEqual(len(cache), 0)
+
+
+class DetectedLanguagesTestCase(unittest.TestCase):
+
+    def test_detect_caches_languages_of_normalized_text(self):
+        languages = DetectedLanguages()
+        detect = mock.Mock(side_effect=['de', None])
+        self.assertEqual(languages.detect('Guten Tag', detect), 'de')
+        self.assertEqual(languages.detect(' Guten\n Tag ', detect), 'de')
+        self.assertIsNone(languages.detect('42', detect))
+        self.assertIsNone(languages.detect('42', detect))
+        self.assertListEqual(
+            detect.call_args_list,
+            [mock.call('Guten Tag'), mock.call('42')])
+        self.assertEqual(languages.hits, 2)
+
+    def test_zero_size_disables_the_cache(self):
+        languages = DetectedLanguages(max_size=0)
+        languages.detect('Guten Tag', lambda text: 'de')
+        self.assertEqual(len(languages), 0)
+
+    def test_run_langdetect_is_deterministic(self):
+        text = 'Ein kurzer Satz'
+        self.assertEqual(len({run_langdetect(text) for _ in range(20)}), 1)
+
+    def test_run_langdetect_uses_a_random_seed_for_null(self):
+        seeds = []
+
+        def detect(detector):
+            seeds.append(detector.seed)
+            return 'de'
+
+        with mock.patch('wordhyphenator.main.config',
+                        {'language_detection_seed': None}), mock.patch(
+                            'langdetect.detector.Detector.detect',
+                            autospec=True,
+                            side_effect=detect):
+            self.assertEqual(run_langdetect('Ein kurzer Satz'), 'de')
+        self.assertListEqual(seeds, [None])
+
+    def test_run_langdetect_returns_none_without_profiles(self):
+        with mock.patch('langdetect.detector_factory.DetectorFactory.create',
+                        side_effect=langdetect.lang_detect_exception.
+                        LangDetectException(0, 'Need to load profiles.')):
+            self.assertIsNone(run_langdetect('Ein kurzer Satz'))
+
+
+class GetDetectionLanguagesTestCase(unittest.TestCase):
+
+    def test_maps_pyphen_languages(self):
+        with mock.patch('wordhyphenator.main.config',
+                        {"languages": ['en_US', 'en_GB', 'de']}):
+            self.assertListEqual(get_detection_languages(['de', 'en', 'pl']),
+                                 ['en', 'de'])
+
+    def test_falls_back_to_all_languages_for_unknown_languages(self):
+        with mock.patch('wordhyphenator.main.config',
+                        {"languages": ['en', 'xx']}),\
+                mock.patch('wordhyphenator.main.warn') as warn:
+            self.assertListEqual(get_detection_languages(['de', 'en']), [])
+        warn.assert_called_once()
+        self.assertIn('xx', warn.call_args[0][0])
+        self.assertIn('all languages', warn.call_args[0][0])
+
+    def test_drops_unknown_languages(self):
+        with mock.patch('wordhyphenator.main.config',
+                        {"languages": ['en', 'xx', 'de']}),\
+                mock.patch('wordhyphenator.main.warn') as warn:
+            self.assertListEqual(get_detection_languages(['de', 'en']),
+                                 ['en', 'de'])
+        warn.assert_called_once()
+        self.assertNotIn('all languages', warn.call_args[0][0])
+
+    def test_imports_langdetect_with_unknown_languages(self):
+        factory = langdetect.detector_factory._factory
+        self.addCleanup(setattr, langdetect.detector_factory, '_factory',
+                        factory)
+        with mock.patch('wordhyphenator.main.config',
+                        {"languages": ['en', 'xx']}),\
+                mock.patch('wordhyphenator.main.warn'):
+            module = import_langdetect()
+        self.assertGreater(len(module.detector_factory._factory.langlist), 2)
+
+
+class ScriptClassifierTestCase(unittest.TestCase):
+
+    def test_classifies_text_without_letters(self):
+        classifier = ScriptClassifier()
+        self.assertEqual(classifier.classify('12:30, 3.14 — ?!'), (True, None))
+
+    def test_classifies_single_candidate_scripts(self):
+        classifier = ScriptClassifier()
+        self.assertEqual(classifier.classify('Καλημέρα κόσμε'), (True, 'el'))
+        self.assertEqual(classifier.classify('ひらがなと漢字'), (True, 'ja'))
+
+    def test_leaves_ambiguous_text_to_detection(self):
+        classifier = ScriptClassifier()
+        self.assertEqual(classifier.classify('Guten Tag'), (False, None))
+        self.assertEqual(classifier.classify('Привет'), (False, None))
+        self.assertEqual(classifier.classify('Hello Привет'), (False, None))
+        self.assertEqual(classifier.ambiguous, 3)
+
+    def test_uses_configured_languages(self):
+        classifier = ScriptClassifier(languages=['en', 'ru'])
+        self.assertEqual(classifier.classify('Guten Tag'), (True, 'en'))
+        self.assertEqual(classifier.classify('Привет'), (True, 'ru'))
+        self.assertEqual(classifier.classify('Καλημέρα'), (True, None))
+        self.assertEqual(classifier.classified, 3)
+
+    def test_single_configured_language_skips_detection(self):
+        classifier = ScriptClassifier(languages=['en'])
+        self.assertEqual(classifier.classify('Hello Привет'), (True, 'en'))
+        self.assertEqual(classifier.classify('გამარჯობა'), (True, 'en'))
+        self.assertEqual(classifier.classify('Привет'), (True, None))
+
+
+class FindLanguageOverrideTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.overrides = {
+            'decks': {
+                'German': 'de',
+                'English': 'en'
+            },
+            'note_types': {
+                'Basic (Polish)': 'pl'
+            },
+            'fields': {
+                'French': 'fr'
+            },
+        }
+
+    def test_returns_none_without_overrides(self):
+        self.assertIsNone(
+            find_language_override({}, 'Front', 'Basic', 'German'))
+        self.assertIsNone(
+            find_language_override(self.overrides, 'Front', 'Basic',
+                                   'Default'))
+
+    def test_applies_deck_overrides_to_subdecks(self):
+        self.assertEqual(
+            find_language_override(self.overrides, deck='German::Verbs'), 'de')
+        self.assertEqual(
+            find_language_override(self.overrides, deck='Germany'), None)
+
+    def test_maps_en_to_en_us(self):
+        self.assertEqual(
+            find_language_override(self.overrides, deck='English'), 'en_US')
+
+    def test_prefers_more_specific_overrides(self):
+        self.assertEqual(
+            find_language_override(self.overrides, 'French', 'Basic (Polish)',
+                                   'German'), 'fr')
+        self.assertEqual(
+            find_language_override(self.overrides, 'Front', 'Basic (Polish)',
+                                   'German'), 'pl')
+
+
+class HyphenateNoteTestCase(unittest.TestCase):
+
+    def test_skips_notes_unchanged_since_their_hyphenation(self):
+        note = {'Front': 'hyphenation', 'Back': ''}
+        with mock.patch('wordhyphenator.main.get_field_languages',
+                        return_value={
+                            'Front': 'en_US',
+                            'Back': 'en_US'
+                        }) as get_field_languages:
+            self.assertTrue(hyphenate_note(note))
+            self.assertFalse(hyphenate_note(note))
+        get_field_languages.assert_called_once()
+        self.assertEqual(note['Front'], 'hy\xadphen\xadation')
+
+
+class SetCurrentFieldTestCase(unittest.TestCase):
+
+    def test_saves_the_field_as_the_add_on_own_write(self):
+        editor = mock.Mock(addMode=False, currentField=0)
+        editor.note.fields = ['hy\xadphen\xadation']
+        editor.note.flush.side_effect = lambda: self.assertTrue(
+            is_writing_notes())
+        set_current_field(editor, 'hyphenation')
+        self.assertListEqual(editor.note.fields, ['hyphenation'])
+        editor.note.flush.assert_called_once()
+        self.assertFalse(is_writing_notes())
+
+
+class NoteHooksTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.col = Collection(path.join(self.tmp_dir.name, 'collection.anki2'))
+        self.german_deck_id = self.col.decks.id('German')
+        self.note = self.col.new_note(self.col.models.by_name('Basic'))
+        self.note['Front'] = 'Silbentrennung'
+        self.patches = [
+            mock.patch('wordhyphenator.main.config',
+                       {'language_overrides': {
+                           'decks': {
+                               'German': 'de'
+                           }
+                       }}),
+            mock.patch(
+                'wordhyphenator.main.hyphenate_field',
+                side_effect=lambda field, lang: '{} ({})'.format(field, lang)),
+        ]
+        for patch in self.patches:
+            patch.start()
+        hooks.note_will_be_added.append(on_note_will_be_added)
+        hooks.note_will_flush.append(on_note_will_flush)
+
+    def tearDown(self):
+        hooks.note_will_flush.remove(on_note_will_flush)
+        hooks.note_will_be_added.remove(on_note_will_be_added)
+        for patch in self.patches:
+            patch.stop()
+        self.col.close()
+        self.tmp_dir.cleanup()
+
+    def test_new_note_uses_the_deck_that_it_is_added_to(self):
+        self.col.add_note(self.note, self.german_deck_id)
+        self.assertEqual(
+            self.col.get_note(self.note.id)['Front'], 'Silbentrennung (de)')
+
+    def test_flushing_a_new_note_leaves_it_as_is(self):
+        on_note_will_flush(self.note)
+        self.assertEqual(self.note['Front'], 'Silbentrennung')
+
+
+class HyphenatedFieldsTestCase(unittest.TestCase):
+
+    def test_contains_added_fields(self):
+        fields = HyphenatedFields()
+        fields.add('hy\xadphen\xadation', 'en_US')
+        self.assertIn(('hy\xadphen\xadation', 'en_US'), fields)
+        self.assertNotIn(('hy\xadphen\xadation', None), fields)
+        self.assertNotIn(('hyphenation', 'en_US'), fields)
+
+    def test_contains_field_in_any_language(self):
+        fields = HyphenatedFields()
+        fields.add('hy\xadphen\xadation', 'en_US')
+        self.assertTrue(fields.contains_field('hy\xadphen\xadation'))
+        self.assertFalse(fields.contains_field('hyphenation'))
+
+    def test_add_evicts_least_recently_used_fields(self):
+        fields = HyphenatedFields(max_size=2)
+        fields.add('a', None)
+        fields.add('b', None)
+        self.assertIn(('a', None), fields)
+        fields.add('c', None)
+        self.assertIn(('a', None), fields)
+        self.assertNotIn(('b', None), fields)
+
+
+class GetConfigTestCase(unittest.TestCase):
+
+    def test_returns_falsy_settings(self):
+        with mock.patch('wordhyphenator.main.config', {
+                'word_cache_size': 0,
+                'profiling': False
+        }):
+            self.assertEqual(get_config('word_cache_size', 10000), 0)
+            self.assertIs(get_config('profiling', True), False)
+
+    def test_returns_default_for_missing_or_null_settings(self):
+        with mock.patch('wordhyphenator.main.config', {'languages': None}):
+            self.assertEqual(get_config('languages', []), [])
+            self.assertEqual(get_config('word_cache_size', 10000), 10000)
+        with mock.patch('wordhyphenator.main.config', None):
+            self.assertEqual(get_config('word_cache_size', 10000), 10000)
+
+
+class LazyModuleTestCase(unittest.TestCase):
+
+    def test_imports_the_module_on_first_attribute_access(self):
+        load = mock.Mock(return_value=re)
+        lazy_re = LazyModule(load)
+        load.assert_not_called()
+        self.assertIs(lazy_re.compile, re.compile)
+        self.assertIs(lazy_re.match, re.match)
+        load.assert_called_once()
+
+    def test_imports_the_module_once_from_concurrent_threads(self):
+        loaded = threading.Event()
+
+        def load():
+            loaded.wait(1)
+            return re
+
+        load_mock = mock.Mock(side_effect=load)
+        lazy_re = LazyModule(load_mock)
+        threads = [
+            threading.Thread(target=lambda: lazy_re.compile) for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        loaded.set()
+        for thread in threads:
+            thread.join()
+        load_mock.assert_called_once()
+
+
+class OnMainWindowDidInitTestCase(unittest.TestCase):
+
+    def test_warms_up_without_holding_back_collection_operations(self):
+        with mock.patch('wordhyphenator.main.config',
+                        {"warm_up_in_background": True}),\
+                mock.patch('aqt.mw') as mw:
+            on_main_window_did_init()
+        mw.taskman.run_in_background.assert_called_once_with(
+            warm_up, uses_collection=False)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Unit tests for the operations module."""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from anki import hooks  # type: ignore
+from anki.collection import Collection  # type: ignore
+
+from wordhyphenator import main
+from wordhyphenator.operations import (CHECKPOINTS_KEY, each_note,
+                                       iter_note_id_batches, notes_updater,
+                                       save_checkpoint,
+                                       update_collection_in_batches,
+                                       update_notes_in_batches)
+
+
+class UpdateCollectionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.col = Collection(
+            os.path.join(self.tmp_dir.name, 'collection.anki2'))
+        basic = self.col.models.by_name('Basic')
+        deck_id = self.col.decks.id('Default')
+        for i in range(7):
+            note = self.col.new_note(basic)
+            note['Front'] = 'front {:d}'.format(i)
+            self.col.add_note(note, deck_id)
+        self.note_ids = sorted(self.col.find_notes(''))
+
+    def tearDown(self):
+        self.col.close()
+        self.tmp_dir.cleanup()
+
+    def test_iter_note_id_batches(self):
+        self.assertListEqual(
+            list(iter_note_id_batches(self.col, self.note_ids[1], 2)),
+            [self.note_ids[2:4], self.note_ids[4:6], self.note_ids[6:]])
+
+    def test_resumes_after_the_checkpoint_and_records_progress(self):
+        checkpoints = []
+
+        def update_note(note):
+            note['Back'] = 'updated'
+            return True
+
+        out = update_collection_in_batches(self.col,
+                                           self.note_ids[2],
+                                           each_note(update_note),
+                                           checkpoints.append,
+                                           'Update',
+                                           batch_size=3)
+
+        self.assertEqual(out.count, 4)
+        self.assertListEqual(checkpoints,
+                             [self.note_ids[5], self.note_ids[6], None])
+        self.assertListEqual(
+            [self.col.get_note(note_id)['Back'] for note_id in self.note_ids],
+            [''] * 3 + ['updated'] * 4)
+
+    def test_writes_skip_the_note_will_flush_hook(self):
+
+        def update_note(note):
+            note['Back'] = 'updated'
+            return True
+
+        hooks.note_will_flush.append(main.on_note_will_flush)
+        try:
+            with mock.patch.object(main, 'hyphenate_note') as hyphenate_note:
+                out = update_notes_in_batches(self.col, self.note_ids,
+                                              each_note(update_note), 'Update')
+                hyphenate_note.assert_not_called()
+                self.assertEqual(out.count, len(self.note_ids))
+                self.col.update_note(self.col.get_note(self.note_ids[0]))
+                hyphenate_note.assert_called_once()
+        finally:
+            hooks.note_will_flush.remove(main.on_note_will_flush)
+
+    def test_dehyphenate_job_isnt_undone_by_the_note_will_flush_hook(self):
+        note = self.col.get_note(self.note_ids[0])
+        note['Front'] = 'hy&shy;phen&shy;ation'
+        self.col.update_note(note)
+        hooks.note_will_flush.append(main.on_note_will_flush)
+        try:
+            with notes_updater('dehyphenate', None, workers=1) as update_notes:
+                update_collection_in_batches(self.col, 0, update_notes,
+                                             lambda note_id: None,
+                                             'Remove Hyphenation')
+        finally:
+            hooks.note_will_flush.remove(main.on_note_will_flush)
+        self.assertEqual(
+            self.col.get_note(self.note_ids[0])['Front'], 'hyphenation')
+
+    def test_dehyphenate_and_rehyphenate_jobs(self):
+        note = self.col.get_note(self.note_ids[0])
+        note['Front'] = 'hyphe&shy;nation'
+        for job, expected in [('dehyphenate', 'hyphenation'),
+                              ('rehyphenate', 'hy&shy;phen&shy;ation')]:
+            with notes_updater(job, ['Front'], workers=1) as update_notes:
+                self.assertListEqual(update_notes([note]), [note])
+            self.assertEqual(note['Front'].replace('\xad', '&shy;'), expected)
+
+
+class SaveCheckpointTestCase(unittest.TestCase):
+
+    def test_keeps_settings_changed_since_startup(self):
+        mw = mock.Mock()
+        mw.addonManager.getConfig.return_value = {
+            'batch_size': 5,
+            CHECKPOINTS_KEY: {
+                'other': {
+                    'hyphenate': 3
+                }
+            }
+        }
+        with mock.patch('wordhyphenator.operations.aqt.mw', mw), \
+                mock.patch.object(main, 'config', {'batch_size': 100}):
+            save_checkpoint('user', 'hyphenate', 7)
+        mw.addonManager.writeConfig.assert_called_once_with(
+            'wordhyphenator.operations', {
+                'batch_size': 5,
+                CHECKPOINTS_KEY: {
+                    'other': {
+                        'hyphenate': 3
+                    },
+                    'user': {
+                        'hyphenate': 7
+                    }
+                }
+            })
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Unit tests for the profiles module."""
+import json
+import os
+import tempfile
+import unittest
+
+import langdetect  # type: ignore
+from langdetect.detector_factory import DetectorFactory  # type: ignore
+
+from wordhyphenator.profiles import (build_bundle, install_profiles,
+                                     list_profile_languages, load_bundle,
+                                     read_bundle_languages)
+
+PROFILES = [
+    {
+        'name': 'de',
+        'freq': {
+            'a': 10,
+            'ß': 2,
+            'ch': 4,
+            'sch': 3,
+            'long': 1
+        },
+        'n_words': [12, 4, 3]
+    },
+    {
+        'name': 'en',
+        'freq': {
+            'a': 7,
+            'th': 5,
+            ' th': 2
+        },
+        'n_words': [7, 5, 2]
+    },
+]
+
+
+class ProfilesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.profile_dir = os.path.join(self.tmp_dir.name, 'profiles')
+        os.mkdir(self.profile_dir)
+        for profile in PROFILES:
+            with open(os.path.join(self.profile_dir, profile['name']),
+                      'w',
+                      encoding='utf-8') as f:
+                json.dump(profile, f)
+        self.bundle_path = os.path.join(self.tmp_dir.name, 'profiles.bin')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_bundle_has_the_same_probabilities_as_langdetect(self):
+        factory = DetectorFactory()
+        factory.load_profile(self.profile_dir)
+        build_bundle(self.profile_dir, self.bundle_path)
+        bundle = load_bundle(self.bundle_path)
+
+        def by_language(languages, probabilities):
+            return dict(zip(languages, probabilities))
+
+        self.assertCountEqual(bundle['languages'], factory.langlist)
+        self.assertCountEqual(bundle['word_lang_prob_map'],
+                              factory.word_lang_prob_map)
+        for word, probabilities in factory.word_lang_prob_map.items():
+            self.assertIn(word, bundle['word_lang_prob_map'])
+            self.assertDictEqual(
+                by_language(bundle['languages'],
+                            bundle['word_lang_prob_map'][word]),
+                by_language(factory.langlist, probabilities), word)
+        self.assertNotIn('xyz', bundle['word_lang_prob_map'])
+
+    def test_load_bundle_loads_only_selected_languages(self):
+        factory = DetectorFactory()
+        factory.load_json_profile(
+            [json.dumps(p) for p in PROFILES if p['name'] == 'en'] +
+            [json.dumps(dict(PROFILES[0], name='xx', freq={'q': 1}))])
+        build_bundle(self.profile_dir, self.bundle_path)
+        bundle = load_bundle(self.bundle_path, languages=['en'])
+
+        self.assertListEqual(bundle['languages'], ['en'])
+        self.assertCountEqual(bundle['word_lang_prob_map'], ['a', 'th', ' th'])
+        for word in ['a', 'th', ' th']:
+            self.assertListEqual(list(bundle['word_lang_prob_map'][word]), [
+                factory.word_lang_prob_map[word][factory.langlist.index('en')]
+            ])
+
+    def test_bundle_and_profile_directory_have_the_same_languages(self):
+        build_bundle(self.profile_dir, self.bundle_path)
+        self.assertListEqual(read_bundle_languages(self.bundle_path),
+                             ['de', 'en'])
+        self.assertListEqual(list_profile_languages(self.profile_dir),
+                             ['de', 'en'])
+
+    def test_load_bundle_rejects_other_files(self):
+        with open(self.bundle_path, 'wb') as f:
+            f.write(b'{}')
+        self.assertRaises(ValueError, load_bundle, self.bundle_path)
+
+    def test_install_profiles_rejects_fewer_than_two_languages(self):
+        with self.assertRaisesRegex(ValueError, 'has 1: en'):
+            install_profiles(langdetect, self.profile_dir, ['en', 'xx'])
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Unit tests for the profiling module."""
+import json
+import unittest
+
+from wordhyphenator.profiling import StageProfiler
+
+
+class StageProfilerTestCase(unittest.TestCase):
+
+    def test_disabled_profiler_records_nothing(self):
+        profiler = StageProfiler(enabled=False)
+        with profiler.stage('parse'):
+            pass
+        self.assertDictEqual(profiler.to_dict(), {})
+
+    def test_accumulates_counts_and_histograms(self):
+        profiler = StageProfiler(enabled=True)
+        for seconds in [2e-6, 5e-3, 3.0]:
+            profiler.record('parse', seconds)
+        with profiler.stage('serialize'):
+            pass
+
+        stats = json.loads(profiler.to_json())
+        self.assertListEqual(sorted(stats), ['parse', 'serialize'])
+        self.assertEqual(stats['parse']['count'], 3)
+        self.assertAlmostEqual(stats['parse']['total_s'], 3.005002)
+        self.assertEqual(stats['parse']['max_s'], 3.0)
+        self.assertDictEqual(
+            stats['parse']['histogram'], {
+                '<=1e-05s': 1,
+                '<=0.0001s': 0,
+                '<=0.001s': 0,
+                '<=0.01s': 1,
+                '<=0.1s': 0,
+                '<=1s': 0,
+                '>1s': 1
+            })
+        self.assertEqual(profiler.stage_names()[0], 'parse')
+
+    def test_reset(self):
+        profiler = StageProfiler(enabled=True)
+        profiler.record('parse', 1.0)
+        profiler.reset()
+        self.assertIsNone(profiler.get('parse'))
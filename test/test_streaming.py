@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Unit tests for the streaming module."""
+import functools
+import unittest
+
+from test.test_main import assertHtmlEqual, get_golden_pairs, read_file
+from wordhyphenator.main import hyphenate_text
+from wordhyphenator.streaming import (extract_text_nodes, hyphenate_html,
+                                      hyphenate_html_stream)
+
+
+def bracket(text: str) -> str:
+    return '[' + text + ']'
+
+
+class StreamingTestCase(unittest.TestCase):
+
+    def test_hyphenate_html(self):
+        for (in_file, out_file) in get_golden_pairs():
+            assertHtmlEqual(
+                self, hyphenate_html(read_file(in_file), hyphenate_text),
+                read_file(out_file),
+                '{in_file:s} doesn\'t match {out_file:s}.'.format(
+                    in_file=in_file, out_file=out_file))
+
+    def test_hyphenate_html_keeps_markup(self):
+        self.assertEqual(
+            hyphenate_html(
+                '<div class=x><img src="berührung">hyphenation<br></div>',
+                functools.partial(hyphenate_text, lang='en_US')),
+            '<div class=x><img src="berührung">hy\xadphen\xadation<br></div>')
+
+    def test_hyphenate_html_skips_comments_pre_and_style(self):
+        self.assertEqual(
+            hyphenate_html('<!--a--><pre>b<b>c</b></pre><style>d</style>e',
+                           bracket),
+            '<!--a--><pre>b<b>c</b></pre><style>d</style>[e]')
+
+    def test_hyphenate_html_keeps_declarations_and_cdata(self):
+        markup = ('<!DOCTYPE html><div>a</div><![CDATA[b]]><?pi c?>'
+                  '<!-- d --><script>if (1 < 2) f("</g>");</script>')
+        expected = markup.replace('>a<', '>[a]<')
+        self.assertEqual(hyphenate_html(markup, bracket), expected)
+        self.assertEqual(
+            ''.join(
+                hyphenate_html_stream(
+                    [markup[:20], markup[20:40], markup[40:]], bracket)),
+            expected)
+
+    def test_hyphenate_html_normalizes_end_tags(self):
+        self.assertEqual(hyphenate_html('<DIV>a</DIV >', bracket),
+                         '<DIV>[a]</div>')
+
+    def test_hyphenate_html_closes_pre_with_its_parent(self):
+        self.assertEqual(hyphenate_html('<div><pre>a</div>b', bracket),
+                         '<div><pre>a</div>[b]')
+
+    def test_hyphenate_html_rewrites_whole_text_nodes(self):
+        self.assertEqual(hyphenate_html('a < b &amp; c', bracket),
+                         '[a &lt; b &amp; c]')
+
+    def test_hyphenate_html_stream_emits_output_as_it_goes(self):
+        self.assertListEqual(
+            list(hyphenate_html_stream(['<div>ab', 'cd</div', '>ef'],
+                                       bracket)),
+            ['<div>', '[abcd]</div>', '[ef]'])
+
+    def test_extract_text_nodes(self):
+        self.assertListEqual(
+            extract_text_nodes('<b>a</b><pre>b</pre><!--c-->d'), ['a', 'd'])
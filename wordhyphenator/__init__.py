@@ -1,3 +1,3 @@
 # -*- coding: utf-8 -*-
 """Module-level entry point for the add-on into Anki 2.1"""
-from . import main
+from . import browser, deferred, main, tools
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""Hyphenation of large batches of fields in multiple processes.
+
+Hyphenation is CPU-bound pure Python, so bulk jobs fan fields out to a pool
+of worker processes. Fields are sent in chunks to amortize inter-process
+communication, and results come back in the order of the input.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Collection, Dict, List, Optional, Sequence, Tuple
+
+import anki  # type: ignore
+
+from . import main
+
+# How many fields a worker hyphenates per work unit.
+DEFAULT_CHUNK_SIZE = 64
+
+logger = logging.getLogger(__name__)
+
+
+def init_worker(config: Any) -> None:
+    """Applies the add-on configuration in a worker process.
+
+    Workers don't run inside Anki, so they can't read the configuration
+    themselves.
+    """
+    main.config = config
+    main.dictionary_pool.max_size = main.get_config("dictionary_pool_size", 16)
+    main.word_cache.max_size = main.get_config("word_cache_size", 10000)
+    main.detected_languages.max_size = main.get_config("detection_cache_size",
+                                                       10000)
+    main.hyphenated_fields.max_size = main.get_config(
+        "hyphenated_field_cache_size", 10000)
+    main.script_classifier.languages = main.get_configured_languages()
+
+
+def hyphenate_chunk(chunk: Sequence[Tuple[str, Optional[str]]]) -> List[str]:
+    """Hyphenates a work unit of (field, language) pairs."""
+    return [main.hyphenate_field(field, lang) for field, lang in chunk]
+
+
+class BatchHyphenator:
+    """Hyphenates batches of fields in a pool of worker processes.
+
+    With a single worker, or if worker processes can't be started, fields are
+    hyphenated in the current process.
+    """
+
+    def __init__(self,
+                 workers: Optional[int] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            workers: The number of worker processes. If None, it's the number
+              of CPUs.
+        """
+        self.chunk_size = chunk_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if workers is None or workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=workers,
+                                                 initializer=init_worker,
+                                                 initargs=(main.config, ))
+
+    def __enter__(self) -> 'BatchHyphenator':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def hyphenate_fields(
+            self,
+            fields: Sequence[str],
+            langs: Optional[Sequence[Optional[str]]] = None) -> List[str]:
+        """Hyphenates the fields.
+
+        Args:
+            langs: Languages of the fields. None means detection.
+
+        Returns:
+            Hyphenated fields in the order of `fields`.
+        """
+        work = list(zip(fields, langs or [None] * len(fields)))
+        chunks = [
+            work[start:start + self.chunk_size]
+            for start in range(0, len(work), self.chunk_size)
+        ]
+        if self._executor is not None and len(chunks) > 1:
+            try:
+                new_fields = [
+                    field
+                    for chunk in self._executor.map(hyphenate_chunk, chunks)
+                    for field in chunk
+                ]
+            except (BrokenProcessPool, OSError):
+                logger.exception(
+                    'Worker processes failed. Hyphenating in-process.')
+                self.close()
+            else:
+                # Workers remember their results in their own processes.
+                # Remember them here too, so that saving the notes later
+                # skips unchanged fields.
+                for field, (_, lang) in zip(new_fields, work):
+                    main.hyphenated_fields.add(field, lang)
+                return new_fields
+        return hyphenate_chunk(work)
+
+
+def hyphenate_fields(fields: Sequence[str],
+                     langs: Optional[Sequence[Optional[str]]] = None,
+                     workers: Optional[int] = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[str]:
+    """Hyphenates the fields in a pool of worker processes.
+
+    Args:
+        langs: Languages of the fields. None means detection.
+        workers: The number of worker processes. If None, it's the number of
+          CPUs.
+
+    Returns:
+        Hyphenated fields in the order of `fields`.
+    """
+    with BatchHyphenator(workers, chunk_size) as hyphenator:
+        return hyphenator.hyphenate_fields(fields, langs)
+
+
+def hyphenate_notes(hyphenator: BatchHyphenator,
+                    notes: Sequence[anki.notes.Note],
+                    field_names: Optional[Collection[str]] = None,
+                    refresh: bool = False) -> List[anki.notes.Note]:
+    """Hyphenates fields of the notes in place, like `main.hyphenate_note`.
+
+    Args:
+        field_names: Fields to hyphenate. If None, all fields are hyphenated.
+        refresh: Whether to remove existing soft hyphens first.
+
+    Returns:
+        Notes that have changed.
+    """
+    targets: List[Tuple[anki.notes.Note, str]] = []
+    fields: List[str] = []
+    langs: List[Optional[str]] = []
+    for note in notes:
+        keys = [
+            key for key, field in note.items()
+            if field != "" and (field_names is None or key in field_names) and
+            (refresh or not main.hyphenated_fields.contains_field(field))
+        ]
+        if not keys:
+            continue
+        note_langs = main.get_field_languages(note)
+        for key in keys:
+            field = note[key]
+            targets.append((note, key))
+            fields.append(main.dehyphenate_field(field) if refresh else field)
+            langs.append(note_langs[key])
+
+    new_fields = hyphenator.hyphenate_fields(fields, langs)
+    changed: Dict[int, anki.notes.Note] = {}
+    for (note, key), new_field in zip(targets, new_fields):
+        if new_field != note[key]:
+            note[key] = new_field
+            changed[id(note)] = note
+    return list(changed.values())
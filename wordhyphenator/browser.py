@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Browser actions of the word hyphenator."""
+from typing import List, Sequence
+
+from anki.notes import NoteId  # type: ignore
+from anki.utils import ids2str  # type: ignore
+from aqt import gui_hooks  # type: ignore
+from aqt.qt import (QAction, QDialog, QDialogButtonBox, QLabel, QListWidget,
+                    QListWidgetItem, Qt, QVBoxLayout, qconnect)
+from aqt.utils import tooltip  # type: ignore
+
+from .operations import notes_op
+
+# Browser actions and the jobs that they run.
+ACTIONS = [
+    ('Hyphenate Selected Notes', 'hyphenate'),
+    ('Remove Hyphenation from Selected Notes', 'dehyphenate'),
+    ('Re-hyphenate Selected Notes', 'rehyphenate'),
+]
+
+
+class FieldChooser(QDialog):
+    """Lets the user choose which fields to process."""
+
+    def __init__(self, parent, title: str, field_names: List[str]):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel('Fields to process:'))
+        self.field_list = QListWidget()
+        for field_name in field_names:
+            item = QListWidgetItem(field_name)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked)
+            self.field_list.addItem(item)
+        layout.addWidget(self.field_list)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok
+                                   | QDialogButtonBox.StandardButton.Cancel)
+        qconnect(buttons.accepted, self.accept)
+        qconnect(buttons.rejected, self.reject)
+        layout.addWidget(buttons)
+
+    def selected_field_names(self) -> List[str]:
+        field_names = []
+        for i in range(self.field_list.count()):
+            item = self.field_list.item(i)
+            if item and item.checkState() == Qt.CheckState.Checked:
+                field_names.append(item.text())
+        return field_names
+
+
+def get_field_names(col, note_ids: Sequence[NoteId]) -> List[str]:
+    """Returns names of fields of the notes' note types."""
+    note_type_ids = col.db.list('select distinct mid from notes where id in ' +
+                                ids2str(note_ids))
+    field_names: List[str] = []
+    for note_type_id in note_type_ids:
+        for field_name in col.models.field_names(col.models.get(note_type_id)):
+            if field_name not in field_names:
+                field_names.append(field_name)
+    return field_names
+
+
+def on_update_selected_notes(browser, title: str, job: str) -> None:
+    note_ids = browser.selected_notes()
+    if not note_ids:
+        tooltip('No notes selected.', parent=browser)
+        return
+    chooser = FieldChooser(browser, title,
+                           get_field_names(browser.col, note_ids))
+    if not chooser.exec():
+        return
+    field_names = chooser.selected_field_names()
+    if not field_names:
+        return
+    notes_op(browser, job, note_ids,
+             field_names).run_in_background(initiator=browser)
+
+
+def on_browser_menus_did_init(browser) -> None:
+    browser.form.menu_Notes.addSeparator()
+    for title, job in ACTIONS:
+        action = QAction(title + '...', browser)
+        # `triggered` passes the `checked` flag. Default arguments bind the
+        # loop variables.
+        qconnect(action.triggered,
+                 lambda _, title=title, job=job: on_update_selected_notes(
+                     browser, title, job))
+        browser.form.menu_Notes.addAction(action)
+
+
+gui_hooks.browser_menus_did_init.append(on_browser_menus_did_init)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""Hyphenation of saved notes in the background.
+
+With `apply_on_note_flush_in_background`, saving a note only records its id.
+Once no note has been saved for `background_flush_delay_ms`, the recorded notes
+are loaded and hyphenated in a background thread and then written back by a
+collection operation with its own undo entry. Rapid successive saves of the
+same note thus result in a single write, and the editor doesn't wait for the
+pipeline.
+"""
+import functools
+import logging
+import threading
+from concurrent.futures import Future, wait
+from typing import Dict, List, Optional, Sequence
+
+import aqt  # type: ignore
+from anki import hooks  # type: ignore
+from anki.collection import Collection as AnkiCollection  # type: ignore
+from anki.collection import OpChangesWithCount  # type: ignore
+from anki.errors import NotFoundError  # type: ignore
+from anki.notes import Note, NoteId  # type: ignore
+from anki.utils import ids2str  # type: ignore
+from aqt import gui_hooks  # type: ignore
+from aqt.operations import CollectionOp  # type: ignore
+from aqt.qt import QTimer, qconnect  # type: ignore
+
+from .main import (get_config, hyphenate_note, is_writing_notes, writing_notes)
+
+logger = logging.getLogger(__name__)
+
+UNDO_LABEL = 'Hyphenate Saved Notes'
+
+
+class PendingNotes:
+    """Ids of saved notes waiting for hyphenation in the order of first save.
+
+    A note saved many times is pending once.
+    """
+
+    def __init__(self):
+        self._note_ids: Dict[NoteId, None] = {}
+        self._lock = threading.Lock()
+
+    def add(self, note_id: NoteId) -> None:
+        with self._lock:
+            self._note_ids[note_id] = None
+
+    def take(self) -> List[NoteId]:
+        """Removes and returns all pending note ids."""
+        with self._lock:
+            note_ids = list(self._note_ids)
+            self._note_ids.clear()
+            return note_ids
+
+    def __len__(self) -> int:
+        return len(self._note_ids)
+
+
+def hyphenate_stored_notes(col: AnkiCollection,
+                           note_ids: Sequence[NoteId]) -> List[Note]:
+    """Hyphenates the notes as they are stored in the collection.
+
+    Notes deleted in the meantime are skipped. Nothing is written back.
+
+    Returns:
+        The notes that have changed.
+    """
+    changed: List[Note] = []
+    for note_id in note_ids:
+        try:
+            note = col.get_note(note_id)
+        except NotFoundError:
+            continue
+        if hyphenate_note(note):
+            changed.append(note)
+    return changed
+
+
+def write_hyphenated_notes(col: AnkiCollection,
+                           notes: Sequence[Note]) -> OpChangesWithCount:
+    """Writes back notes hyphenated by `hyphenate_stored_notes`.
+
+    Notes saved again since they were loaded are skipped, so that the write
+    doesn't revert the newer save, which has scheduled them again. The check
+    and the write run in the same collection operation, so that no save
+    lands in between. The write gets an undo entry of its own, so undoing it
+    doesn't undo the user's edit.
+
+    Returns:
+        Changes with the number of written notes.
+    """
+    assert col.db is not None
+    mods: Dict[NoteId, int] = {
+        note_id: mod
+        for note_id, mod in
+        col.db.all('select id, mod from notes where id in ' +
+                   ids2str(note.id for note in notes))
+    }
+    current = [note for note in notes if mods.get(note.id) == note.mod]
+    if not current:
+        return OpChangesWithCount(count=0)
+    undo_entry = col.add_custom_undo_entry(UNDO_LABEL)
+    with writing_notes():
+        col.update_notes(current)
+    return OpChangesWithCount(count=len(current),
+                              changes=col.merge_undo_entries(undo_entry))
+
+
+class DeferredHyphenator:
+    """Coalesces note saves and hyphenates the saved notes in the background.
+
+    Each save restarts a single timer, so a burst of saves leads to a single
+    background task. Saves that arrive while a task runs wait for the next one.
+    """
+
+    def __init__(self, mw, delay_ms: int):
+        self.mw = mw
+        self.delay_ms = delay_ms
+        self.pending = PendingNotes()
+        self._timer: Optional[QTimer] = None
+        self._task: Optional[Future] = None
+
+    def schedule(self, note_id: NoteId) -> None:
+        """Records a saved note. Can be called from any thread."""
+        self.pending.add(note_id)
+        self.mw.taskman.run_on_main(self._restart_timer)
+
+    def _restart_timer(self) -> None:
+        if self._timer is None:
+            self._timer = QTimer(self.mw)
+            self._timer.setSingleShot(True)
+            qconnect(self._timer.timeout, self._start)
+        self._timer.start(self.delay_ms)
+
+    def _start(self) -> None:
+        if self._task is not None:
+            self._restart_timer()
+            return
+        if self.mw.col is None or not self.pending:
+            return
+        task = functools.partial(hyphenate_stored_notes, self.mw.col,
+                                 self.pending.take())
+        self._task = self.mw.taskman.run_in_background(task,
+                                                       on_done=self._on_done)
+
+    def _on_done(self, future: Future) -> None:
+        # A task waited for by `drain` has already been written back.
+        if future is not self._task:
+            return
+        self._task = None
+        try:
+            notes = future.result()
+        except Exception:
+            logger.exception('Failed to hyphenate saved notes.')
+            notes = []
+        if notes and self.mw.col is not None:
+            CollectionOp(
+                self.mw, functools.partial(write_hyphenated_notes,
+                                           notes=notes)).run_in_background()
+        if self.pending:
+            self._restart_timer()
+
+    def drain(self) -> None:
+        """Hyphenates all pending notes right away on the main thread.
+
+        A running background task is waited for, so that its notes are
+        written back before the collection closes.
+        """
+        if self._timer is not None:
+            self._timer.stop()
+        notes: List[Note] = []
+        task, self._task = self._task, None
+        if task is not None:
+            wait([task])
+            if task.exception() is None:
+                notes.extend(task.result())
+        col = self.mw.col
+        if col is None:
+            return
+        notes.extend(hyphenate_stored_notes(col, self.pending.take()))
+        if notes:
+            write_hyphenated_notes(col, notes)
+
+
+def on_note_will_flush(deferred: DeferredHyphenator, note: Note) -> None:
+    """Schedules the note for hyphenation.
+
+    New notes are hyphenated right away by `main.on_note_will_be_added`.
+    """
+    if is_writing_notes() or not note.id:
+        return
+    deferred.schedule(note.id)
+
+
+def is_enabled() -> bool:
+    return bool(
+        get_config("apply_on_note_flush", False)
+        and get_config("apply_on_note_flush_in_background", False))
+
+
+if is_enabled():
+    deferred_hyphenator = DeferredHyphenator(
+        aqt.mw, get_config("background_flush_delay_ms", 1000))
+    hooks.note_will_flush.append(
+        functools.partial(on_note_will_flush, deferred_hyphenator))
+    gui_hooks.profile_will_close.append(deferred_hyphenator.drain)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""A bounded least recently used cache that the add-on's caches build on."""
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+# Returned by `LruCache.lookup` for missing keys, since None may be cached.
+MISSING: Any = object()
+
+
+class LruCache:
+    """A thread-safe map that keeps up to `max_size` recently used entries.
+
+    Lookups count hits and misses. A `max_size` of 0 or less disables the
+    cache.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Returns the value of the key and marks it as recently used.
+
+        Returns:
+            The value or `default` if the key isn't cached.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def store(self, key: Hashable, value: Any) -> None:
+        """Caches the value and evicts the least recently used entries."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            # `max_size` may have shrunk since the last store.
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
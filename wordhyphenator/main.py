@@ -1,89 +1,554 @@
 # -*- coding: utf-8 -*-
 """The implementation of the word hyphenator plugin."""
+from __future__ import annotations
+
+import contextlib
+import functools
+import hashlib
+import importlib
 import os.path
 import re
 import sys
-from typing import List, Optional
+import threading
+import unicodedata
+from html import escape, unescape
+from html.entities import html5 as html5_entities
+from types import ModuleType
+from typing import (TYPE_CHECKING, Callable, Collection, Dict, Iterable,
+                    Iterator, List, Optional, Set, Tuple)
 
 sys.path.append(os.path.dirname(__file__))
 
 import anki  # type: ignore
 import aqt  # type: ignore
-import bs4  # type: ignore
 from anki import hooks
+from anki.decks import DeckId  # type: ignore
 from aqt import gui_hooks  # type: ignore
 from aqt.utils import showWarning  # type: ignore
-from bs4 import BeautifulSoup, NavigableString  # type: ignore
 
-# Import locally in case we are executing as a packaged Anki addon
-try:
-    from . import langdetect  # type: ignore
-except ImportError:
-    import langdetect  # type: ignore
+from . import profiles, profiling, streaming
+from .lru import MISSING, LruCache
+
+
+class LazyModule:
+    """A module that is imported on first attribute access.
+
+    bs4, langdetect and pyphen take a noticeable time to import, so they are
+    deferred until the first hyphenation. This keeps Anki's startup fast in
+    sessions that never hyphenate.
+
+    The module may be first used from the warm-up task and the main thread at
+    once, so it is loaded under a lock.
+    """
+
+    def __init__(self, load: Callable[[], ModuleType]):
+        self._load = load
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = self._load()
+        return getattr(self._module, name)
+
+
+def import_vendored(name: str) -> ModuleType:
+    """Imports a dependency bundled with the add-on or installed globally."""
+    # Import locally in case we are executing as a packaged Anki addon
+    if __package__:
+        try:
+            return importlib.import_module('.' + name, __package__)
+        except ImportError:
+            pass
+    return importlib.import_module(name)
 
-try:
-    from . import pyphen  # type: ignore
-except ImportError:
-    import pyphen  # type: ignore
 
 addon_path = os.path.dirname(__file__)
+# Built by `dev/bin/package` from langdetect's profiles.
+PROFILE_BUNDLE_PATH = os.path.join(addon_path, 'langdetect-profiles.bin')
+
+
+def to_langdetect_language(lang: str) -> str:
+    """Maps a Pyphen language, e.g., en_US, to its langdetect language."""
+    # langdetect separates regions with a hyphen, e.g., zh-cn, and Pyphen with
+    # an underscore.
+    return lang.split('_')[0]
+
+
+def get_configured_languages() -> List[str]:
+    """Returns the `languages` setting as langdetect languages."""
+    languages: List[str] = []
+    for lang in get_config("languages", []):
+        lang = to_langdetect_language(lang)
+        if lang not in languages:
+            languages.append(lang)
+    return languages
+
+
+def get_detection_languages(available: Collection[str]) -> List[str]:
+    """Returns the langdetect languages of the `languages` setting.
+
+    Languages that langdetect has no profile for are dropped with a warning.
+    langdetect can't run with fewer than two profiles, so if fewer than two
+    of several configured languages remain, detection falls back to all
+    languages.
+
+    Args:
+        available: Languages that langdetect has profiles for.
+
+    Returns:
+        The languages or an empty list for all languages.
+    """
+    configured = get_configured_languages()
+    languages = [lang for lang in configured if lang in available]
+    unknown = [lang for lang in configured if lang not in available]
+    if len(languages) < 2:
+        languages = []
+    if unknown:
+        message = ('langdetect has no profiles for {} from the "languages" '
+                   'setting.'.format(', '.join(unknown)))
+        if not languages and len(configured) > 1:
+            message += ' Detection chooses from all languages instead.'
+        warn(message)
+    return languages
+
+
+def warn(message: str) -> None:
+    """Shows the warning on the main thread."""
+
+    def show() -> None:
+        showWarning(message)
+
+    if aqt.mw:
+        aqt.mw.taskman.run_on_main(show)
+
+
+def import_langdetect() -> ModuleType:
+    """Imports langdetect with the compact profile bundle if it's available.
+
+    If the `languages` setting is set, langdetect only loads profiles of those
+    languages. The profiles are loaded here, so that they are loaded once
+    under the lock of `LazyModule`.
+    """
+    module = import_vendored('langdetect')
+    profile_directory = module.detector_factory.PROFILES_DIRECTORY
+    if os.path.isfile(PROFILE_BUNDLE_PATH):
+        languages = get_detection_languages(
+            profiles.read_bundle_languages(PROFILE_BUNDLE_PATH))
+        profiles.install_bundle(module, PROFILE_BUNDLE_PATH, languages or None)
+    else:
+        languages = get_detection_languages(
+            profiles.list_profile_languages(profile_directory))
+        if languages:
+            profiles.install_profiles(module, profile_directory, languages)
+    module.detector_factory.init_factory()
+    return module
+
+
+if TYPE_CHECKING:
+    import bs4  # type: ignore
+    import langdetect  # type: ignore
+    import pyphen  # type: ignore
+else:
+    bs4 = LazyModule(lambda: importlib.import_module('bs4'))
+    langdetect = LazyModule(import_langdetect)
+    pyphen = LazyModule(lambda: import_vendored('pyphen'))
+
 config = aqt.mw and aqt.mw.addonManager.getConfig(__name__)
 
 
 def get_config(key: str, default):
-    return (config and config.get(key, default)) or default
+    """Returns the configured value of the key.
+
+    Only a missing key or null falls back to the default, because 0 and false
+    are meaningful settings, e.g., a cache size of 0 disables the cache.
+    """
+    value = config.get(key) if config else None
+    return default if value is None else value
+
 
+profiler = profiling.StageProfiler(enabled=get_config("profiling", False))
 
 SHY = '\xad'
 
 
+def resolve_language(lang: str) -> str:
+    """Maps a language code detected by langdetect to a Pyphen language."""
+    if lang == 'en':
+        # Use US dictionary for English, because it seems that the US
+        # dictionary is richer. For example en_GB doesn't hyphenate
+        # "format," but US does ("for-mat").
+        return 'en_US'
+    return lang
+
+
+class DictionaryPool(LruCache):
+    """A process-wide pool of Pyphen dictionaries keyed by language.
+
+    Constructing `pyphen.Pyphen` resolves language fallbacks and looks up
+    pattern files, which is wasteful to repeat for every text node. The pool
+    keeps the least recently used dictionaries up to `max_size` languages.
+    Languages without a Pyphen dictionary are remembered as well, so that
+    repeated misdetections don't repeat the failed lookup.
+    """
+
+    def __init__(self, max_size: int = 16):
+        super().__init__(max_size)
+        self._load_lock = threading.Lock()
+
+    def get(self, lang: str):
+        """Returns a Pyphen dictionary for the language.
+
+        Raises:
+            KeyError: Pyphen has no dictionary for the language.
+        """
+        lang = resolve_language(lang)
+        # The warm-up task and the main thread may ask for the same
+        # dictionary at once, so it is constructed under a lock.
+        with self._load_lock:
+            dic = self.lookup(lang)
+            if dic is MISSING:
+                try:
+                    with profiler.stage('pyphen_dictionary'):
+                        dic = pyphen.Pyphen(lang=lang)
+                except KeyError:
+                    dic = None
+                self.store(lang, dic)
+        if dic is None:
+            raise KeyError(lang)
+        return dic
+
+    def warm_up(self, langs: Iterable[str]) -> None:
+        """Loads dictionaries for the languages ahead of time."""
+        for lang in langs:
+            try:
+                self.get(lang)
+            except KeyError:
+                pass
+
+
+dictionary_pool = DictionaryPool(
+    max_size=get_config("dictionary_pool_size", 16))
+
+
+class WordCache(LruCache):
+    """A bounded LRU cache of hyphenated words keyed by (language, word).
+
+    Vocabulary decks repeat the same words across thousands of notes, so
+    remembering Pyphen's output skips pattern matching for most words.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        super().__init__(max_size)
+
+    def get(self, lang: str, word: str) -> Optional[str]:
+        """Returns the hyphenated word or None if it's not cached."""
+        return self.lookup((lang, word), None)
+
+    def put(self, lang: str, word: str, hyphenated: str) -> None:
+        self.store((lang, word), hyphenated)
+
+
+word_cache = WordCache(max_size=get_config("word_cache_size", 10000))
+
+
+class HyphenatedFields(LruCache):
+    """A bounded set of fingerprints of fields that this add-on produced.
+
+    A field whose fingerprint is in the set hasn't changed since it was
+    hyphenated, so it doesn't need to go through the pipeline again. This
+    makes repeated saves of the same note nearly free. The set remembers the
+    language of each field, so that a field can be checked before its language
+    is known.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        super().__init__(max_size)
+
+    @staticmethod
+    def fingerprint(field: str) -> bytes:
+        return hashlib.blake2b(field.encode(), digest_size=16).digest()
+
+    def __contains__(self, key: Tuple[str, Optional[str]]) -> bool:
+        """Checks whether the (field, language) pair was produced here."""
+        field, lang = key
+        return self.lookup(self.fingerprint(field)) == lang
+
+    def contains_field(self, field: str) -> bool:
+        """Checks whether the field was produced here in any language."""
+        return self.lookup(self.fingerprint(field)) is not MISSING
+
+    def add(self, field: str, lang: Optional[str]) -> None:
+        self.store(self.fingerprint(field), lang)
+
+
+hyphenated_fields = HyphenatedFields(
+    max_size=get_config("hyphenated_field_cache_size", 10000))
+# Text nodes that incremental hyphenation produced. They are keyed the same
+# way as fields.
+hyphenated_texts = HyphenatedFields(
+    max_size=get_config("hyphenated_text_cache_size", 10000))
+
+
+class RenderedSides(LruCache):
+    """A bounded LRU cache of hyphenated card sides keyed by rendered HTML.
+
+    In render-time hyphenation, the same card sides are shown again and
+    again, e.g., the question before the answer or a card in a later review.
+    Keys are fingerprints, so long cards don't occupy memory twice.
+    """
+
+    def __init__(self, max_size: int = 1000):
+        super().__init__(max_size)
+
+    @staticmethod
+    def fingerprint(html: str, lang: Optional[str]) -> bytes:
+        return hashlib.blake2b('{}\0{}'.format(lang or '', html).encode(),
+                               digest_size=16).digest()
+
+    def get(self, html: str, lang: Optional[str]) -> Optional[str]:
+        """Returns the hyphenated side or None if it's not cached."""
+        return self.lookup(self.fingerprint(html, lang), None)
+
+    def put(self, html: str, lang: Optional[str], hyphenated: str) -> None:
+        self.store(self.fingerprint(html, lang), hyphenated)
+
+
+rendered_sides = RenderedSides(
+    max_size=get_config("rendered_card_cache_size", 1000))
+
+
+class DetectedLanguages(LruCache):
+    """A bounded LRU cache of detected languages keyed by normalized text.
+
+    Language detection is the slowest step of hyphenation, and the same short
+    fragments, e.g., field labels or repeated phrases, recur across notes.
+    Texts that differ only in whitespace share an entry. Undetectable texts are
+    remembered as well.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        super().__init__(max_size)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return ' '.join(text.split())
+
+    @staticmethod
+    def fingerprint(text: str) -> bytes:
+        return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+    def detect(self, text: str,
+               detect: Callable[[str], Optional[str]]) -> Optional[str]:
+        """Returns the cached language of the text or detects it.
+
+        Args:
+            detect: A function that detects the language of a normalized text.
+        """
+        text = self.normalize(text)
+        fingerprint = self.fingerprint(text)
+        lang = self.lookup(fingerprint)
+        if lang is MISSING:
+            lang = detect(text)
+            self.store(fingerprint, lang)
+        return lang
+
+
+detected_languages = DetectedLanguages(
+    max_size=get_config("detection_cache_size", 10000))
+
+# langdetect languages written in each Unicode script. A script is the first
+# word of a character's Unicode name.
+SCRIPT_LANGUAGES: Dict[str, Collection[str]] = {
+    'ARABIC': {'ar', 'fa', 'ur'},
+    'BENGALI': {'bn'},
+    'CJK': {'ja', 'zh-cn', 'zh-tw'},
+    'CYRILLIC': {'bg', 'mk', 'ru', 'uk'},
+    'DEVANAGARI': {'hi', 'mr', 'ne'},
+    'GREEK': {'el'},
+    'GUJARATI': {'gu'},
+    'GURMUKHI': {'pa'},
+    'HANGUL': {'ko'},
+    'HEBREW': {'he'},
+    'HIRAGANA': {'ja'},
+    'KANNADA': {'kn'},
+    'KATAKANA': {'ja'},
+    'LATIN': {
+        'af', 'ca', 'cs', 'cy', 'da', 'de', 'en', 'es', 'et', 'fi', 'fr', 'hr',
+        'hu', 'id', 'it', 'lt', 'lv', 'nl', 'no', 'pl', 'pt', 'ro', 'sk', 'sl',
+        'so', 'sq', 'sv', 'sw', 'tl', 'tr', 'vi'
+    },
+    'MALAYALAM': {'ml'},
+    'TAMIL': {'ta'},
+    'TELUGU': {'te'},
+    'THAI': {'th'},
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def get_script(char: str) -> str:
+    """Returns the Unicode script of the letter, e.g., LATIN."""
+    return unicodedata.name(char, '').split(' ', 1)[0]
+
+
+class ScriptClassifier:
+    """Classifies the language of text by the scripts of its letters.
+
+    Looking at scripts is much cheaper than running langdetect and is enough
+    for many texts: text without letters has no language, and text in, e.g.,
+    Greek or in the only configured Latin language has a single candidate.
+    The counters tell how many texts needed full detection.
+    """
+
+    def __init__(self, languages: Optional[Collection[str]] = None):
+        """
+        Args:
+            languages: Languages that may be detected. If None, all languages
+              are candidates.
+        """
+        self.languages = languages
+        self.classified = 0
+        self.ambiguous = 0
+
+    def get_candidates(self, scripts: Iterable[str]) -> Optional[Set[str]]:
+        """Returns the languages that may be written in all the scripts.
+
+        Returns:
+            The candidate languages or None if the scripts don't tell, e.g.,
+            because they are unknown or mixed like Latin and Cyrillic.
+        """
+        candidates: Optional[Set[str]] = None
+        for script in scripts:
+            script_languages = SCRIPT_LANGUAGES.get(script)
+            if script_languages is None:
+                return None
+            candidates = (set(script_languages) if candidates is None else
+                          candidates & set(script_languages))
+        if not candidates:
+            return None
+        if self.languages:
+            candidates &= set(self.languages)
+        return candidates
+
+    def classify(self, text: str) -> Tuple[bool, Optional[str]]:
+        """Classifies the language of the text by its scripts.
+
+        Returns:
+            A pair (classified, language). If classified is True, language is
+            the langdetect language of the text or None if the text has no
+            language that can be detected. Otherwise, the text needs full
+            language detection.
+        """
+        scripts = {get_script(char) for char in text if char.isalpha()}
+        candidates = self.get_candidates(scripts) if scripts else set()
+        if candidates is None and self.languages and len(self.languages) == 1:
+            # langdetect would choose the only language anyway, and it can't
+            # run with a single profile.
+            candidates = set(self.languages)
+        if candidates is None or len(candidates) > 1:
+            self.ambiguous += 1
+            return False, None
+        self.classified += 1
+        return True, next(iter(candidates), None)
+
+    def reset(self) -> None:
+        self.classified = 0
+        self.ambiguous = 0
+
+
+script_classifier = ScriptClassifier(languages=get_configured_languages())
+
+WORD = re.compile(r'(\w+)')
+# Non-word chunks that may contain words: HTML entities and MathJax formulas.
+PROTECTED_CHUNK = r'&[a-zA-Z]+;|\\\(.*?\\\)|\\\[.*?\\\]'
+# Matches either a word (captured) or a protected chunk in a single scan.
+WORD_OR_PROTECTED_CHUNK = re.compile(r'(\w+)|' + PROTECTED_CHUNK, re.DOTALL)
+
+
+def iter_chunks(text: str) -> Iterator[str]:
+    """Lazily splits the text into alternating non-word and word chunks.
+
+    HTML entities and MathJax formulas, i.e., \\(...\\) and \\[...\\], are
+    parts of non-word chunks.
+
+    Yields:
+        An odd number of chunks with words at odd positions.
+    """
+    non_word_start = 0
+    for match in WORD_OR_PROTECTED_CHUNK.finditer(text):
+        word = match.group(1)
+        if word is None:
+            continue
+        yield text[non_word_start:match.start()]
+        yield word
+        non_word_start = match.end()
+    yield text[non_word_start:]
+
+
 def chunkify(text: str) -> List[str]:
-    # Do not match HTML entities
-    html_entities = re.compile('(&[a-zA-Z]+;)')
-    words = re.compile(r'(\b\w+\b)')
-    chunks = []
-    non_word_chunks = []
-    for i, chunk in enumerate(html_entities.split(text)):
-        if i % 2 == 0:
-            for j, word in enumerate(words.split(chunk)):
-                if j % 2 == 0:
-                    non_word_chunks.append(word)
-                else:
-                    chunks.append(''.join(non_word_chunks))
-                    non_word_chunks = []
-                    chunks.append(word)
-        else:
-            non_word_chunks.append(chunk)
-    chunks.append(''.join(non_word_chunks))
-    return chunks
+    """Splits the text into alternating non-word and word chunks.
 
+    See `iter_chunks`.
+    """
+    if '&' not in text and '\\' not in text:
+        # Without protected chunks, a plain split does the same in C.
+        return WORD.split(text)
+    return list(iter_chunks(text))
+
+
+def hyphenate_word(dic, word: str, lang: Optional[str] = None) -> str:
+    """Hyphenates a single word.
+
+    Args:
+        lang: The language of `dic`. If provided, the result is looked up in
+          and stored in the shared word cache.
+    """
+    if lang is None:
+        return dic.inserted(word, SHY)
+    hyphenated = word_cache.get(lang, word)
+    if hyphenated is None:
+        hyphenated = dic.inserted(word, SHY)
+        word_cache.put(lang, word, hyphenated)
+    return hyphenated
 
-def hyphenate_single_words(dic, text: str) -> str:
+
+def hyphenate_single_words(dic, text: str, lang: Optional[str] = None) -> str:
     new_chunks = []
-    for i, chunk in enumerate(chunkify(text)):
-        if i % 2 == 0:
-            new_chunks.append(chunk)
-        else:
-            new_chunks.append(dic.inserted(chunk, SHY))
+    with profiler.stage('hyphenate_words'):
+        for i, chunk in enumerate(chunkify(text)):
+            if i % 2 == 0:
+                new_chunks.append(chunk)
+            else:
+                new_chunks.append(hyphenate_word(dic, chunk, lang))
     return ''.join(new_chunks)
 
 
-def hyphenate_end_node(dic, text: str) -> str:
-    output = hyphenate_single_words(dic, text)
+def hyphenate_end_node(dic, text: str, lang: Optional[str] = None) -> str:
+    # MathJax formulas are protected by `chunkify`.
+    return hyphenate_single_words(dic, text, lang)
+
 
-    find_hyphen_in_mathjax = r'\\\((.*?)' + SHY + r'(.*?)\\\)'
-    while re.search(find_hyphen_in_mathjax, output):
-        output = re.sub(find_hyphen_in_mathjax, r'\(\1\2\)', output)
+# Pyphen doesn't hyphenate within the first `left` and the last `right`
+# characters of a word, which are 2 by default. Shorter words never change.
+HYPHENATABLE_WORD = re.compile(r'\w{4,}')
 
-    find_hyphen_in_mathjax = r'\\\[(.*?)' + SHY + r'(.*?)\\\]'
-    while re.search(find_hyphen_in_mathjax, output):
-        output = re.sub(find_hyphen_in_mathjax, r'\[\1\2\]', output)
 
-    return output
+def has_hyphenatable_word(text: str) -> bool:
+    """Checks whether the text has a word that is long enough to hyphenate.
+
+    Text without one, e.g., whitespace, punctuation, numbers or short words,
+    can be left alone without detecting its language.
+    """
+    return HYPHENATABLE_WORD.search(text) is not None
+
+
+IGNORED_TEXT = re.compile(r'\[[^\]]+\]')
 
 
 def should_ignore(text):
-    return bool(re.match(r'\[[^\]]+\]', text))
+    return bool(IGNORED_TEXT.match(text))
 
 
 def only_printable(text: str) -> str:
@@ -110,13 +575,13 @@ class DfsStack:
         else:
             raise StopIteration()
 
-    def send(self, new_nodes: List[bs4.PageElement]):
+    def send(self, new_nodes: Iterable[bs4.PageElement]):
         self.nodes.extend(list(new_nodes))
 
 
-def visit_and_hyphenate(
-        node: bs4.PageElement) -> Optional[List[bs4.PageElement]]:
-    """Visits HTML nodes and hyphenates text.
+def visit_text_nodes(node: bs4.PageElement,
+                     func) -> Optional[Iterable[bs4.PageElement]]:
+    """Visits HTML nodes and calls `func` on text nodes subject to hyphenation.
 
     Returns:
         Children of tag elements that should be further processed, e.g., <pre>
@@ -139,31 +604,111 @@ def visit_and_hyphenate(
             return None
         if node.name == 'style':
             return None
+        if node.name == 'script':
+            return None
         return node.children
 
     if not isinstance(node, bs4.NavigableString):
         return None
 
+    func(node)
+    return None
+
+
+def run_langdetect(text: str) -> Optional[str]:
+    """Runs langdetect with the configured seed and number of trials.
+
+    langdetect samples n-grams at random, so without a fixed seed the same
+    text may be detected differently each time.
+
+    Returns:
+        A Pyphen language or None if the language couldn't be detected.
+    """
+    try:
+        langdetect.detector_factory.init_factory()
+        detector = langdetect.detector_factory._factory.create()
+        # null means a different seed each time, so it doesn't fall back to
+        # the default.
+        detector.seed = (config.get("language_detection_seed", 0)
+                         if config else 0)
+        detector.n_trial = get_config("language_detection_trials", 7)
+        detector.append(text)
+        with profiler.stage('langdetect'):
+            return resolve_language(detector.detect())
+    except langdetect.lang_detect_exception.LangDetectException:
+        return None
+
+
+def detect_language(text: str) -> Optional[str]:
+    """Detects the Pyphen language of the text.
+
+    Returns:
+        A Pyphen language or None if the language couldn't be detected.
+    """
+    with profiler.stage('detect_language'):
+        classified, lang = script_classifier.classify(text)
+        if classified:
+            return lang and resolve_language(lang)
+        return detected_languages.detect(text, run_langdetect)
+
+
+def hyphenate_text(text: str, lang: Optional[str] = None) -> str:
+    """Hyphenates the text of a single text node.
+
+    Args:
+        lang: The language of the text. If None, it's detected from the text.
+
+    Returns:
+        The hyphenated text or the original text if it shouldn't be or can't
+        be hyphenated.
+    """
+    if not has_hyphenatable_word(text):
+        return text
     # My intention is to remove silent-hyphens, so that language detection
     # works correctly.
-    printable_text = only_printable(node)
+    printable_text = only_printable(text)
     if should_ignore(printable_text):
-        return None
+        return text
 
+    if lang is None:
+        lang = detect_language(printable_text)
+        if lang is None:
+            return text
     try:
-        lang = langdetect.detect(printable_text)
-        if lang == 'en':
-            # Use US dictionary for English, because it seems that the US
-            # dictionary is richer. For example en_GB doesn't hyphenate
-            # "format," but US does ("for-mat").
-            lang = 'en_US'
-        dic = pyphen.Pyphen(lang=lang)
-    except (langdetect.lang_detect_exception.LangDetectException, KeyError):
-        return None
+        dic = dictionary_pool.get(lang)
+    except KeyError:
+        return text
 
-    new_text = hyphenate_end_node(dic, node)
-    node.replace_with(new_text)
-    return None
+    return hyphenate_end_node(dic, text, lang)
+
+
+def hyphenate_text_node(node: bs4.NavigableString,
+                        lang: Optional[str] = None) -> None:
+    """Hyphenates the text node in place.
+
+    Args:
+        lang: The language of the text. If None, it's detected from the node.
+    """
+    new_text = hyphenate_text(node, lang)
+    if new_text != node:
+        node.replace_with(new_text)
+
+
+def visit_and_hyphenate(
+        node: bs4.PageElement,
+        lang: Optional[str] = None) -> Optional[Iterable[bs4.PageElement]]:
+    """Visits HTML nodes and hyphenates text.
+
+    Args:
+        lang: The language of the text. If None, it's detected for each text
+          node separately.
+
+    Returns:
+        Children of tag elements that should be further processed, e.g., <pre>
+        elements are skipped.
+    """
+    return visit_text_nodes(node,
+                            functools.partial(hyphenate_text_node, lang=lang))
 
 
 def walk(soup: bs4.BeautifulSoup, func):
@@ -174,58 +719,410 @@ def walk(soup: bs4.BeautifulSoup, func):
             dfs_stack.send(maybe_more_nodes)
 
 
-def hyphenate(html: str) -> str:
+def get_detectable_text(soup: bs4.BeautifulSoup) -> str:
+    """Concatenates printable text of all nodes subject to hyphenation."""
+    texts: List[str] = []
+
+    def collect(node: bs4.NavigableString) -> None:
+        printable_text = only_printable(node)
+        if not should_ignore(printable_text):
+            texts.append(printable_text)
+
+    walk(soup, functools.partial(visit_text_nodes, func=collect))
+    return '\n'.join(texts)
+
+
+def parse_html(html: str) -> bs4.BeautifulSoup:
+    with profiler.stage('parse'):
+        return bs4.BeautifulSoup(html, features='html.parser')
+
+
+def serialize_html(soup: bs4.BeautifulSoup, formatter: str) -> str:
+    with profiler.stage('serialize'):
+        return soup.decode(formatter=formatter)
+
+
+def extract_detectable_text(html: str) -> str:
+    """Concatenates printable text of the HTML document."""
+    return get_detectable_text(parse_html(html))
+
+
+def get_language_detection_mode() -> str:
+    """Returns the granularity of language detection.
+
+    Returns:
+        'node' (detect for each text node), 'field' (detect once for the whole
+        field) or 'note' (detect once for all fields of a note).
+    """
+    return get_config("language_detection", "node")
+
+
+def hyphenate_soup(soup: bs4.BeautifulSoup,
+                   lang: Optional[str] = None,
+                   detect_per_field: bool = False) -> None:
+    """Hyphenates the parsed HTML document in place.
+
+    Args:
+        lang: The language of the document. If None, it's detected.
+        detect_per_field: Whether to detect the language once for the whole
+          document instead of for each text node.
+    """
+    if lang is None and detect_per_field:
+        lang = detect_language(get_detectable_text(soup))
+        if lang is None:
+            return None
+    walk(soup, functools.partial(visit_and_hyphenate, lang=lang))
+
+
+def hyphenate(html: str,
+              lang: Optional[str] = None,
+              detect_per_field: bool = False) -> str:
     """Hyphenates the HTML document.
 
     >>> hyphenate('<div>&asymp; hyphenation</div>')
     '<div>&asymp; hy&shy;phen&shy;ation</div>')
 
+    Args:
+        lang: The language of the document. If None, it's detected.
+        detect_per_field: Whether to detect the language once for the whole
+          document instead of for each text node.
+
     Returns:
         An HTML5-encoded string with hyphenation.
     """
-    soup = BeautifulSoup(html, features='html.parser')
-    walk(soup, visit_and_hyphenate)
-    return str(soup.encode(formatter='html5'), 'utf8')
+    soup = parse_html(html)
+    hyphenate_soup(soup, lang=lang, detect_per_field=detect_per_field)
+    return serialize_html(soup, 'html5')
 
 
 def use_minimal_html_formatting(html: str) -> str:
     """Reformats the HTML string using minimal encoding."""
-    bs = BeautifulSoup(html, features='html.parser')
-    return str(bs.encode(formatter='minimal'), 'utf8')
+    return serialize_html(parse_html(html), 'minimal')
 
 
-def hyphenate_field(field: str) -> str:
-    """Hyphenates the field.
+MAYBE_HTML_ENTITY = re.compile(r'&([a-zA-Z][a-zA-Z0-9]*;)?')
+
+
+def is_plain_text(field: str) -> bool:
+    """Checks whether the field can be hyphenated without an HTML parser.
+
+    A plain text field has no markup and no ampersands other than named HTML
+    entities. Whitespace-only fields are excluded, because BeautifulSoup
+    collapses them.
+    """
+    if '<' in field or not field.strip(' \t\n\r\f'):
+        return False
+    return all(
+        m.group(1) in html5_entities
+        for m in MAYBE_HTML_ENTITY.finditer(field))
+
+
+def hyphenate_plain_text_field(field: str, lang: Optional[str] = None) -> str:
+    """Hyphenates a field for which `is_plain_text` holds.
+
+    The field is a single text node, so it's hyphenated directly and encoded
+    the same way as `hyphenate_html_field` would encode it.
+    """
+    return escape(hyphenate_text(unescape(field), lang), quote=False)
+
+
+def hyphenate_html_field(field: str, lang: Optional[str] = None) -> str:
+    """Hyphenates the field with the full HTML pipeline.
+
+    Args:
+        lang: The language of the field. If None, it's detected according to
+          the `language_detection` setting.
 
     Returns:
         A hyphenated field.
     """
-    new_field_with_html5 = hyphenate(field)
-    # Reformatting is necessary, because
-    # * hyphenate('<img src="berührung">') == '<img src="ber&uuml;hrung"/>'
+    soup = parse_html(field)
+    hyphenate_soup(soup,
+                   lang=lang,
+                   detect_per_field=get_language_detection_mode() != 'node')
+    # Use minimal formatting, because
+    # * the HTML5 formatter turns '<img src="berührung">' into
+    #   '<img src="ber&uuml;hrung"/>'
     # * Anki desktop wouldn't display the `berührung` image when
     #   `src="ber&uuml;hrung"` (even though it's valid HTML
     #   (https://bit.ly/3ewd4bj)
-    return use_minimal_html_formatting(new_field_with_html5)
+    return serialize_html(soup, 'minimal')
 
 
-def hyphenate_action(editor) -> None:
+def hyphenate_streaming_field(field: str, lang: Optional[str] = None) -> str:
+    """Hyphenates the field with the streaming HTML engine.
+
+    Unlike `hyphenate_html_field`, this keeps markup as is.
+
+    Args:
+        lang: The language of the field. If None, it's detected according to
+          the `language_detection` setting.
+
+    Returns:
+        A hyphenated field.
+    """
+    if lang is None and get_language_detection_mode() != 'node':
+        lang = detect_streaming_field_language(field)
+        if lang is None:
+            return field
+    return streaming.hyphenate_html(
+        field, functools.partial(hyphenate_text, lang=lang))
+
+
+def detect_streaming_field_language(field: str) -> Optional[str]:
+    """Detects the language of the field's text without building a tree."""
+    printable_texts = (only_printable(text)
+                       for text in streaming.extract_text_nodes(field))
+    return detect_language('\n'.join(text for text in printable_texts
+                                     if not should_ignore(text)))
+
+
+def hyphenate_changed_text(text: str, lang: Optional[str] = None) -> str:
+    """Hyphenates a text node unless incremental hyphenation produced it."""
+    if (text, lang) in hyphenated_texts:
+        return text
+    new_text = hyphenate_text(text, lang)
+    hyphenated_texts.add(new_text, lang)
+    return new_text
+
+
+def hyphenate_field_incrementally(field: str,
+                                  lang: Optional[str] = None) -> str:
+    """Hyphenates text nodes that changed since the field's last hyphenation.
+
+    Text nodes that this function has recently returned are kept as is, so
+    after a small edit of a long field only the edited nodes are hyphenated.
+    The whole field is still tokenized, though, so the work still grows with
+    the field's size. Like in `hyphenate_streaming_field`, markup is kept as
+    is.
+
+    Args:
+        lang: The language of the field. If None, it's detected according to
+          the `language_detection` setting.
+
+    Returns:
+        A hyphenated field.
+    """
+    if (field, lang) in hyphenated_fields:
+        return field
+    if lang is None and get_language_detection_mode() != 'node':
+        lang = detect_streaming_field_language(field)
+        if lang is None:
+            return field
+    new_field = streaming.hyphenate_html(
+        field, functools.partial(hyphenate_changed_text, lang=lang))
+    hyphenated_fields.add(new_field, lang)
+    return new_field
+
+
+def hyphenate_field(field: str, lang: Optional[str] = None) -> str:
+    """Hyphenates the field.
+
+    Args:
+        lang: The language of the field. If None, it's detected according to
+          the `language_detection` setting.
+
+    Returns:
+        A hyphenated field. A field that this function has recently returned
+        is returned as is.
+    """
+    if (field, lang) in hyphenated_fields:
+        return field
+    with profiler.stage('hyphenate_field'):
+        if is_plain_text(field):
+            new_field = hyphenate_plain_text_field(field, lang)
+        elif get_config("html_engine", "beautifulsoup") == "streaming":
+            new_field = hyphenate_streaming_field(field, lang)
+        else:
+            new_field = hyphenate_html_field(field, lang)
+    hyphenated_fields.add(new_field, lang)
+    return new_field
+
+
+def rewrite_text_nodes(field: str, rewrite: Callable[[str], str]) -> str:
+    """Rewrites text nodes subject to hyphenation.
+
+    The field is parsed and encoded by the same engine as in
+    `hyphenate_field`.
+    """
+    if is_plain_text(field):
+        return escape(rewrite(unescape(field)), quote=False)
+    if get_config("html_engine", "beautifulsoup") == "streaming":
+        return streaming.hyphenate_html(field, rewrite)
+    soup = parse_html(field)
+
+    def rewrite_node(node: bs4.NavigableString) -> None:
+        new_text = rewrite(node)
+        if new_text != node:
+            node.replace_with(new_text)
+
+    walk(soup, functools.partial(visit_text_nodes, func=rewrite_node))
+    return serialize_html(soup, 'minimal')
+
+
+def dehyphenate_text(text: str) -> str:
+    return text.replace(SHY, '')
+
+
+def dehyphenate_field(field: str) -> str:
+    """Removes soft hyphens, i.e., `\xad` and `&shy;`, from the field's text.
+
+    Fields without soft hyphens are returned as is.
+    """
+    if SHY not in unescape(field):
+        return field
+    return rewrite_text_nodes(field, dehyphenate_text)
+
+
+def find_language_override(overrides: Dict[str, Dict[str, str]],
+                           field_name: Optional[str] = None,
+                           note_type: Optional[str] = None,
+                           deck: Optional[str] = None) -> Optional[str]:
+    """Finds the configured language of a field.
+
+    Field overrides take precedence over note type overrides, which take
+    precedence over deck overrides. A deck override applies to subdecks too.
+
+    Args:
+        overrides: The `language_overrides` setting.
+
+    Returns:
+        The Pyphen language or None if no override applies.
+    """
+    by_field = overrides.get("fields", {})
+    if field_name in by_field:
+        return resolve_language(by_field[field_name])
+    by_note_type = overrides.get("note_types", {})
+    if note_type in by_note_type:
+        return resolve_language(by_note_type[note_type])
+    by_deck = overrides.get("decks", {})
+    while deck:
+        if deck in by_deck:
+            return resolve_language(by_deck[deck])
+        deck = deck.rpartition('::')[0]
+    return None
+
+
+def get_note_type_name(note: anki.notes.Note) -> Optional[str]:
+    note_type = note.note_type()
+    return note_type['name'] if note_type else None
+
+
+def get_note_deck_name(note: anki.notes.Note,
+                       deck_id: Optional[DeckId] = None) -> Optional[str]:
+    """Returns the name of the note's deck.
+
+    Args:
+        deck_id: The deck of a note that has no cards yet.
+    """
+    if deck_id is None:
+        cards = note.cards() if note.id else []
+        if not cards:
+            return None
+        # Use the home deck of cards in filtered decks.
+        deck_id = cards[0].odid or cards[0].did
+    return note.col.decks.name(deck_id)
+
+
+def get_editor_deck_id(editor) -> Optional[DeckId]:
+    """Returns the deck selected in the Add window."""
+    deck_chooser = getattr(editor.parentWindow, 'deck_chooser', None)
+    return deck_chooser.selected_deck_id if deck_chooser else None
+
+
+def get_field_languages(
+        note: anki.notes.Note,
+        deck_id: Optional[DeckId] = None) -> Dict[str, Optional[str]]:
+    """Returns languages of the note's fields.
+
+    The language of a field comes from `language_overrides` or, in the 'note'
+    detection mode, from detection over all fields without an override.
+
+    Returns:
+        A map from field names to languages. None means that the language
+        should be detected for each field or text node separately.
+    """
+    overrides = get_config("language_overrides", {})
+    note_type = get_note_type_name(note) if overrides.get(
+        "note_types") else None
+    deck = get_note_deck_name(note,
+                              deck_id) if overrides.get("decks") else None
+    langs = {
+        key: find_language_override(overrides, key, note_type, deck)
+        for key in note.keys()
+    }
+    undetermined = [key for key, lang in langs.items() if lang is None]
+    if undetermined and get_language_detection_mode() == 'note':
+        note_lang = detect_language('\n'.join(
+            extract_detectable_text(note[key]) for key in undetermined))
+        for key in undetermined:
+            langs[key] = note_lang
+    return langs
+
+
+def has_current_field(editor) -> bool:
+    """Checks whether a field is selected and warns the user if it isn't."""
     if editor.currentField is None:
         showWarning(
             "You've run the word hyphenator without selecting a field.\n" +
             "Please select a note field before running the word hyphenator.")
+        return False
+    return True
+
+
+def get_current_field_language(editor) -> Optional[str]:
+    field_name = editor.note.keys()[editor.currentField]
+    deck_id = get_editor_deck_id(editor) if editor.addMode else None
+    return get_field_languages(editor.note, deck_id)[field_name]
+
+
+def hyphenate_action(editor) -> None:
+    if not has_current_field(editor):
+        return None
+
+    field = editor.note.fields[editor.currentField]
+    lang = get_current_field_language(editor)
+    if get_config("editor_hyphenation", "field") == "incremental":
+        new_field = hyphenate_field_incrementally(field, lang=lang)
+    else:
+        new_field = hyphenate_field(field, lang=lang)
+    set_current_field(editor, new_field)
+
+
+def dehyphenate_action(editor) -> None:
+    if not has_current_field(editor):
         return None
+    set_current_field(
+        editor, dehyphenate_field(editor.note.fields[editor.currentField]))
+
 
+def rehyphenate_action(editor) -> None:
+    if not has_current_field(editor):
+        return None
     field = editor.note.fields[editor.currentField]
-    new_field = hyphenate_field(field)
+    set_current_field(
+        editor,
+        hyphenate_field(dehyphenate_field(field),
+                        lang=get_current_field_language(editor)))
+
+
+def set_current_field(editor, new_field: str) -> None:
+    """Saves the new content of the current field and shows it."""
+    # Reloading the note is what makes long fields slow, so skip it if
+    # there's nothing new to show.
+    if new_field == editor.note.fields[editor.currentField]:
+        return None
     editor.note.fields[editor.currentField] = new_field
 
     # That's how aqt.editor.onHtmlEdit saves cards.
     # It's better than `editor.mw.reset()`, because the latter loses focus.
     # Calls like editor.mw.reset() or editor.loadNote() are necessary to save
     # HTML changes.
+    # The field is final, so the write skips `apply_on_note_flush`, which would
+    # hyphenate a field that the user has just dehyphenated.
     if not editor.addMode:
-        editor.note.flush()
+        with writing_notes():
+            editor.note.flush()
     editor.loadNoteKeepingFocus()
 
 
@@ -246,13 +1143,185 @@ def on_editor_buttons_init(buttons: List, editor) -> None:
 gui_hooks.editor_did_init_buttons.append(on_editor_buttons_init)
 
 
-def on_note_will_flush(note: anki.notes.Note):
-    """Hyphenates all fields of the note."""
+def on_editor_will_show_context_menu(webview, menu) -> None:
+    editor = webview.editor
+    if editor is None or editor.currentField is None:
+        return None
+    menu.addSeparator()
+    menu.addAction('Remove Hyphenation',
+                   functools.partial(dehyphenate_action, editor))
+    menu.addAction('Re-hyphenate', functools.partial(rehyphenate_action,
+                                                     editor))
+
+
+gui_hooks.editor_will_show_context_menu.append(
+    on_editor_will_show_context_menu)
+
+
+def warm_up() -> None:
+    """Loads dependencies, language profiles and dictionaries ahead of use."""
+    bs4.BeautifulSoup('', features='html.parser')
+    # A single configured language is never detected.
+    if len(get_configured_languages()) != 1:
+        langdetect.detector_factory.init_factory()
+    dictionary_pool.warm_up(get_config("warm_up_languages", []))
+
+
+def on_main_window_did_init() -> None:
+    if (get_config("warm_up_in_background", False)
+            or get_config("warm_up_languages", [])):
+        # The warm-up doesn't touch the collection, so it mustn't hold back
+        # collection operations.
+        aqt.mw.taskman.run_in_background(warm_up, uses_collection=False)
+
+
+gui_hooks.main_window_did_init.append(on_main_window_did_init)
+
+
+def hyphenate_note(note: anki.notes.Note,
+                   field_names: Optional[Collection[str]] = None,
+                   deck_id: Optional[DeckId] = None,
+                   refresh: bool = False) -> bool:
+    """Hyphenates fields of the note in place.
+
+    Args:
+        field_names: Fields to hyphenate. If None, all fields are hyphenated.
+        deck_id: The deck of a note that has no cards yet.
+        refresh: Whether to remove existing soft hyphens first, e.g., to
+          apply updated dictionaries.
+
+    Returns:
+        Whether any field has changed.
+    """
+    # Resolving languages may run detection over the whole note, so it's done
+    # only if some field has changed since its hyphenation.
+    keys = [
+        key for key, field in note.items()
+        if field != "" and (field_names is None or key in field_names) and (
+            refresh or not hyphenated_fields.contains_field(field))
+    ]
+    if not keys:
+        return False
+    langs = get_field_languages(note, deck_id)
+    changed = False
+    for key in keys:
+        field = note[key]
+        source = dehyphenate_field(field) if refresh else field
+        new_field = hyphenate_field(source, lang=langs[key])
+        if new_field != field:
+            note[key] = new_field
+            changed = True
+    return changed
+
+
+def dehyphenate_note(note: anki.notes.Note,
+                     field_names: Optional[Collection[str]] = None) -> bool:
+    """Removes soft hyphens from fields of the note in place.
+
+    Args:
+        field_names: Fields to process. If None, all fields are processed.
+
+    Returns:
+        Whether any field has changed.
+    """
+    changed = False
     for key, field in note.items():
-        if field == "":
+        if field_names is not None and key not in field_names:
             continue
-        note[key] = hyphenate_field(field)
+        new_field = dehyphenate_field(field)
+        if new_field != field:
+            note[key] = new_field
+            changed = True
+    return changed
+
+
+def hyphenate_rendered_side(html: str, lang: Optional[str] = None) -> str:
+    """Hyphenates a rendered card side.
+
+    The streaming engine keeps the card's markup, e.g., scripts of the card
+    template, exactly as it was.
+
+    Args:
+        lang: The language of the card. If None, it's detected according to
+          the `language_detection` setting.
+    """
+    hyphenated = rendered_sides.get(html, lang)
+    if hyphenated is None:
+        hyphenated = hyphenate_streaming_field(html, lang)
+        rendered_sides.put(html, lang, hyphenated)
+    return hyphenated
+
+
+def get_card_language(card: anki.cards.Card) -> Optional[str]:
+    """Returns the language of the card from its note type or deck override.
+
+    A card side shows many fields, so field overrides don't apply.
+    """
+    overrides = get_config("language_overrides", {})
+    if not overrides.get("note_types") and not overrides.get("decks"):
+        return None
+    deck = card.col.decks.name(card.odid
+                               or card.did) if overrides.get("decks") else None
+    return find_language_override(overrides,
+                                  note_type=get_note_type_name(card.note()),
+                                  deck=deck)
+
+
+def on_card_will_show(text: str, card: anki.cards.Card, kind: str) -> str:
+    """Hyphenates the card side that is about to be shown."""
+    return hyphenate_rendered_side(text, get_card_language(card))
+
+
+if get_config("hyphenate_on_render", False):
+    gui_hooks.card_will_show.append(on_card_will_show)
+
+# Set while the add-on writes notes that it has already processed.
+_writing_notes = threading.local()
+
+
+@contextlib.contextmanager
+def writing_notes() -> Iterator[None]:
+    """Marks note writes in the current thread as the add-on's own.
+
+    `note_will_flush` handlers skip such writes. The notes are already
+    hyphenated or, e.g., dehyphenated on purpose, so processing them again
+    would be wasted work or would undo the change.
+    """
+    previous = is_writing_notes()
+    _writing_notes.active = True
+    try:
+        yield
+    finally:
+        _writing_notes.active = previous
+
+
+def is_writing_notes() -> bool:
+    return getattr(_writing_notes, 'active', False)
+
+
+def on_note_will_be_added(col: anki.collection.Collection,
+                          note: anki.notes.Note, deck_id: DeckId) -> None:
+    """Hyphenates all fields of a new note.
+
+    A new note has no cards yet, so its deck comes from this hook rather than
+    from `note_will_flush`.
+    """
+    hyphenate_note(note, deck_id=deck_id)
+
+
+def on_note_will_flush(note: anki.notes.Note):
+    """Hyphenates all fields of a stored note unless the add-on writes it.
+
+    New notes are left to `on_note_will_be_added`. They are flushed before
+    that too, e.g., when the Add window checks for duplicates.
+    """
+    if is_writing_notes() or not note.id:
+        return
+    hyphenate_note(note)
 
 
 if get_config("apply_on_note_flush", False):
-    hooks.note_will_flush.append(on_note_will_flush)
+    hooks.note_will_be_added.append(on_note_will_be_added)
+    # In the background mode, the `deferred` module hooks note saves instead.
+    if not get_config("apply_on_note_flush_in_background", False):
+        hooks.note_will_flush.append(on_note_will_flush)
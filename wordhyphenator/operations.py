@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""Background operations that hyphenate or dehyphenate many notes at once."""
+import contextlib
+import functools
+from typing import (Callable, Collection, Dict, Iterator, List, Optional,
+                    Sequence, Tuple)
+
+import aqt  # type: ignore
+from anki.collection import Collection as AnkiCollection  # type: ignore
+from anki.collection import OpChanges, OpChangesWithCount  # type: ignore
+from anki.notes import Note, NoteId  # type: ignore
+from aqt.operations import CollectionOp  # type: ignore
+from aqt.utils import tooltip  # type: ignore
+
+from .batch import BatchHyphenator, hyphenate_notes
+from .main import (dehyphenate_note, get_config, hyphenate_note, writing_notes)
+
+# How many notes are loaded and written to the database at once.
+DEFAULT_BATCH_SIZE = 100
+
+
+def batched(items: Sequence, size: int) -> Iterator[Sequence]:
+    """Splits the sequence into consecutive batches of at most `size` items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def report_progress(label: str, done: int, total: int) -> None:
+    """Updates the progress window from a background thread."""
+    if aqt.mw is None:
+        return
+    aqt.mw.taskman.run_on_main(
+        functools.partial(aqt.mw.progress.update,
+                          label=label,
+                          value=done,
+                          max=total))
+
+
+def want_cancel() -> bool:
+    return aqt.mw is not None and aqt.mw.progress.want_cancel()
+
+
+def each_note(
+    update_note: Callable[[Note],
+                          bool]) -> Callable[[Sequence[Note]], List[Note]]:
+    """Turns a function that updates a note into one that updates a batch.
+
+    Args:
+        update_note: Modifies the note in place and returns whether it has
+          changed.
+    """
+    return lambda notes: [note for note in notes if update_note(note)]
+
+
+def update_notes_in_batches(
+        col: AnkiCollection,
+        note_ids: Sequence[NoteId],
+        update_notes: Callable[[Sequence[Note]], Sequence[Note]],
+        undo_label: str,
+        batch_size: int = DEFAULT_BATCH_SIZE) -> OpChangesWithCount:
+    """Updates notes batch by batch under a single undo entry.
+
+    The writes skip `note_will_flush` handlers of the add-on, because
+    `update_notes` has already processed the notes.
+
+    Args:
+        update_notes: Modifies the notes in place and returns the ones that
+          have changed. Only changed notes are written back.
+
+    Returns:
+        Changes with the number of changed notes.
+    """
+    undo_entry = col.add_custom_undo_entry(undo_label)
+    changed_count = 0
+    done = 0
+    for batch in batched(note_ids, batch_size):
+        if want_cancel():
+            break
+        notes = [col.get_note(note_id) for note_id in batch]
+        changed = update_notes(notes)
+        if changed:
+            with writing_notes():
+                col.update_notes(changed)
+            changed_count += len(changed)
+        done += len(batch)
+        report_progress(
+            '{}: {:d}/{:d} notes'.format(undo_label, done, len(note_ids)),
+            done, len(note_ids))
+    return OpChangesWithCount(count=changed_count,
+                              changes=col.merge_undo_entries(undo_entry))
+
+
+# Jobs that update many notes, mapped to their undo labels and to what the
+# completion message says about the changed notes.
+JOBS: Dict[str, Tuple[str, str]] = {
+    'hyphenate': ('Hyphenate Notes', 'Hyphenated {:d} notes.'),
+    'dehyphenate':
+    ('Remove Hyphenation', 'Removed hyphenation from {:d} notes.'),
+    'rehyphenate': ('Re-hyphenate Notes', 'Re-hyphenated {:d} notes.'),
+}
+
+
+@contextlib.contextmanager
+def notes_updater(
+        job: str, field_names: Optional[Collection[str]],
+        workers: int) -> Iterator[Callable[[Sequence[Note]], List[Note]]]:
+    """Provides a function that runs the job on a batch of notes in place.
+
+    The function returns the notes that have changed.
+
+    Args:
+        job: One of `JOBS`.
+        field_names: Fields to update. If None, all fields are updated.
+        workers: The `worker_processes` setting.
+    """
+    if job == 'dehyphenate':
+        # Removing soft hyphens is too cheap to benefit from workers.
+        yield each_note(
+            functools.partial(dehyphenate_note, field_names=field_names))
+        return
+    refresh = job == 'rehyphenate'
+    if workers == 1:
+        yield each_note(
+            functools.partial(hyphenate_note,
+                              field_names=field_names,
+                              refresh=refresh))
+        return
+    with BatchHyphenator(workers or None) as hyphenator:
+        yield functools.partial(hyphenate_notes,
+                                hyphenator,
+                                field_names=field_names,
+                                refresh=refresh)
+
+
+def notes_op(
+    parent,
+    job: str,
+    note_ids: Sequence[NoteId],
+    field_names: Optional[Collection[str]] = None
+) -> CollectionOp[OpChangesWithCount]:
+    """Creates an undoable operation that runs the job on the notes.
+
+    Args:
+        job: One of `JOBS`.
+        field_names: Fields to update. If None, all fields are updated.
+    """
+    batch_size = get_config("batch_size", DEFAULT_BATCH_SIZE)
+    workers = get_config("worker_processes", 1)
+    undo_label, message = JOBS[job]
+
+    def op(col: AnkiCollection) -> OpChangesWithCount:
+        with notes_updater(job, field_names, workers) as update_notes:
+            return update_notes_in_batches(col, note_ids, update_notes,
+                                           undo_label, batch_size)
+
+    return CollectionOp(parent, op).success(
+        lambda out: tooltip(message.format(out.count), parent=parent))
+
+
+# The `collection_job_checkpoints` setting maps profile names to jobs and the
+# id of the last note that the collection-wide job has updated.
+CHECKPOINTS_KEY = "collection_job_checkpoints"
+
+
+def read_config() -> Optional[Dict]:
+    """Reads the current add-on configuration.
+
+    Unlike `main.config`, which is read at startup, this includes changes
+    made in the configuration dialog since then.
+    """
+    if aqt.mw is None:
+        return None
+    return aqt.mw.addonManager.getConfig(__name__)
+
+
+def load_checkpoint(profile: str, job: str) -> NoteId:
+    """Returns the note after which an interrupted job resumes or 0."""
+    checkpoints = (read_config() or {}).get(CHECKPOINTS_KEY) or {}
+    return NoteId(checkpoints.get(profile, {}).get(job, 0))
+
+
+def save_checkpoint(profile: str, job: str, note_id: Optional[NoteId]) -> None:
+    """Records the checkpoint in the add-on configuration.
+
+    Only the checkpoints are updated, other settings are written back as they
+    currently are.
+
+    Args:
+        note_id: The last updated note. None clears the checkpoint.
+    """
+    config = read_config()
+    if not isinstance(config, dict):
+        return
+    checkpoints: Dict[str, Dict[str, int]] = {
+        name: dict(saved_jobs)
+        for name, saved_jobs in (config.get(CHECKPOINTS_KEY) or {}).items()
+    }
+    jobs = checkpoints.setdefault(profile, {})
+    if note_id is None:
+        jobs.pop(job, None)
+    else:
+        jobs[job] = note_id
+    if not jobs:
+        del checkpoints[profile]
+    config[CHECKPOINTS_KEY] = checkpoints
+    aqt.mw.addonManager.writeConfig(__name__, config)
+
+
+def iter_note_id_batches(col: AnkiCollection, after: NoteId,
+                         size: int) -> Iterator[List[NoteId]]:
+    """Yields ids of notes after the given one in id order, batch by batch.
+
+    Ids are queried one batch at a time, so memory use doesn't depend on the
+    size of the collection.
+    """
+    assert col.db is not None
+    while True:
+        note_ids = col.db.list(
+            'select id from notes where id > ? order by id limit ?', after,
+            size)
+        if not note_ids:
+            return
+        yield note_ids
+        after = note_ids[-1]
+
+
+def update_collection_in_batches(
+        col: AnkiCollection,
+        start_after: NoteId,
+        update_notes: Callable[[Sequence[Note]], Sequence[Note]],
+        checkpoint: Callable[[Optional[NoteId]], None],
+        label: str,
+        batch_size: int = DEFAULT_BATCH_SIZE) -> OpChangesWithCount:
+    """Updates all notes after `start_after` and records progress.
+
+    Each batch is saved on its own and followed by a checkpoint, so an
+    interrupted job can resume from the last checkpoint. The updates have no
+    undo entry, because undoing the whole collection isn't practical. Like in
+    `update_notes_in_batches`, the writes skip `note_will_flush` handlers of
+    the add-on.
+
+    Args:
+        update_notes: Modifies the notes in place and returns the ones that
+          have changed. Only changed notes are written back.
+        checkpoint: Records the last updated note. It's called with None once
+          all notes are updated.
+
+    Returns:
+        Changes with the number of changed notes.
+    """
+    assert col.db is not None
+    total = col.note_count()
+    done = col.db.scalar('select count() from notes where id <= ?',
+                         start_after)
+    changed_count = 0
+    finished = True
+    for batch in iter_note_id_batches(col, start_after, batch_size):
+        if want_cancel():
+            finished = False
+            break
+        notes = [col.get_note(note_id) for note_id in batch]
+        changed = update_notes(notes)
+        if changed:
+            with writing_notes():
+                col.update_notes(changed, skip_undo_entry=True)
+            changed_count += len(changed)
+        checkpoint(batch[-1])
+        done += len(batch)
+        report_progress('{}: {:d}/{:d} notes'.format(label, done, total), done,
+                        total)
+    if finished:
+        checkpoint(None)
+    return OpChangesWithCount(count=changed_count,
+                              changes=OpChanges(note=True, note_text=True))
+
+
+def collection_op(parent, job: str, profile: str,
+                  start_after: NoteId) -> CollectionOp:
+    """Creates an operation that runs the job on all notes of the collection.
+
+    Args:
+        job: One of `JOBS`.
+        profile: The profile whose checkpoint is recorded.
+        start_after: The note after which to start. 0 starts from the first
+          note.
+    """
+    batch_size = get_config("batch_size", DEFAULT_BATCH_SIZE)
+    workers = get_config("worker_processes", 1)
+    label, message = JOBS[job]
+
+    def checkpoint(note_id: Optional[NoteId]) -> None:
+        if aqt.mw is not None:
+            aqt.mw.taskman.run_on_main(
+                functools.partial(save_checkpoint, profile, job, note_id))
+
+    def op(col: AnkiCollection) -> OpChangesWithCount:
+        with notes_updater(job, None, workers) as update_notes:
+            return update_collection_in_batches(col, start_after, update_notes,
+                                                checkpoint, label, batch_size)
+
+    return CollectionOp(parent, op).success(
+        lambda out: tooltip(message.format(out.count), parent=parent))
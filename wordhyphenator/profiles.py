@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""A compact bundle of langdetect's language profiles.
+
+langdetect ships its profiles as dozens of JSON files that it parses on the
+first detection and expands into a dense map from n-grams to per-language
+probabilities, which takes about a second and tens of megabytes. The bundle
+stores the same probabilities precomputed in one sparse, array-backed file
+that loads in milliseconds. Probability vectors are expanded lazily, only for
+n-grams that detection actually looks up.
+
+Build a bundle with:
+
+    python wordhyphenator/profiles.py PROFILE_DIRECTORY BUNDLE_PATH
+
+This module only depends on the standard library, so that it can run outside
+Anki.
+"""
+import json
+import os
+import sys
+from array import array
+from types import ModuleType
+from typing import Collection, Dict, Iterator, List, Mapping, Optional
+
+MAGIC = b'WHLP1\n'
+
+
+class ProbabilityMap(Mapping):
+    """A read-only map from n-grams to per-language probabilities.
+
+    It behaves like `DetectorFactory.word_lang_prob_map`, but stores only
+    non-zero probabilities.
+    """
+
+    def __init__(self, languages: int, words: List[str], offsets: array,
+                 language_indices: array, probabilities: array):
+        self._languages = languages
+        self._index = {word: i for i, word in enumerate(words)}
+        self._offsets = offsets
+        self._language_indices = language_indices
+        self._probabilities = probabilities
+        self._expanded: Dict[str, List[float]] = {}
+
+    def __getitem__(self, word: str) -> List[float]:
+        expanded = self._expanded.get(word)
+        if expanded is not None:
+            return expanded
+        i = self._index[word]
+        expanded = [0.0] * self._languages
+        for j in range(self._offsets[i], self._offsets[i + 1]):
+            expanded[self._language_indices[j]] = self._probabilities[j]
+        self._expanded[word] = expanded
+        return expanded
+
+    def __contains__(self, word) -> bool:
+        return word in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+def read_profiles(profile_directory: str) -> List[dict]:
+    """Reads langdetect's JSON profiles sorted by language."""
+    profiles = []
+    for filename in sorted(os.listdir(profile_directory)):
+        path = os.path.join(profile_directory, filename)
+        if filename.startswith('.') or not os.path.isfile(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            profiles.append(json.load(f))
+    return profiles
+
+
+def list_profile_languages(profile_directory: str) -> List[str]:
+    """Returns the languages of langdetect's profile directory."""
+    return sorted(
+        filename for filename in os.listdir(profile_directory)
+        if not filename.startswith('.')
+        and os.path.isfile(os.path.join(profile_directory, filename)))
+
+
+def build_bundle(profile_directory: str, bundle_path: str) -> None:
+    """Converts langdetect's profile directory into a bundle."""
+    profiles = read_profiles(profile_directory)
+    # Compute probabilities the same way `DetectorFactory.add_profile` does.
+    entries: Dict[str, List[tuple]] = {}
+    for index, profile in enumerate(profiles):
+        for word, freq in profile['freq'].items():
+            word_entries = entries.setdefault(word, [])
+            if 1 <= len(word) <= 3:
+                word_entries.append(
+                    (index, 1.0 * freq / profile['n_words'][len(word) - 1]))
+
+    words = list(entries)
+    offsets = array('I', [0])
+    language_indices = array('B')
+    probabilities = array('d')
+    for word in words:
+        for index, probability in entries[word]:
+            language_indices.append(index)
+            probabilities.append(probability)
+        offsets.append(len(probabilities))
+    if sys.byteorder == 'big':
+        for values in (offsets, probabilities):
+            values.byteswap()
+
+    words_blob = '\0'.join(words).encode('utf-8')
+    header = {
+        'languages': [profile['name'] for profile in profiles],
+        'words': len(words),
+        'words_bytes': len(words_blob),
+        'entries': len(probabilities),
+    }
+    with open(bundle_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(json.dumps(header).encode('utf-8') + b'\n')
+        f.write(words_blob)
+        f.write(offsets.tobytes())
+        f.write(language_indices.tobytes())
+        f.write(probabilities.tobytes())
+
+
+def read_array(typecode: str, data: memoryview, start: int,
+               count: int) -> array:
+    values = array(typecode)
+    values.frombytes(data[start:start + count * values.itemsize])
+    if sys.byteorder == 'big' and values.itemsize > 1:
+        values.byteswap()
+    return values
+
+
+def select_languages(languages: List[str], words: List[str], offsets: array,
+                     language_indices: array, probabilities: array,
+                     selected: Collection[str]) -> tuple:
+    """Drops probabilities of languages outside of the selected ones.
+
+    N-grams that don't occur in any selected language are dropped as well, so
+    the result is what langdetect would load from the selected profiles only.
+    """
+    kept_languages = [l for l in languages if l in selected]
+    new_indices = {
+        languages.index(language): index
+        for index, language in enumerate(kept_languages)
+    }
+    new_words: List[str] = []
+    new_offsets = array('I', [0])
+    new_language_indices = array('B')
+    new_probabilities = array('d')
+    for i, word in enumerate(words):
+        for j in range(offsets[i], offsets[i + 1]):
+            new_index = new_indices.get(language_indices[j])
+            if new_index is not None:
+                new_language_indices.append(new_index)
+                new_probabilities.append(probabilities[j])
+        if len(new_probabilities) > new_offsets[-1]:
+            new_words.append(word)
+            new_offsets.append(len(new_probabilities))
+    return (kept_languages, new_words, new_offsets, new_language_indices,
+            new_probabilities)
+
+
+def read_bundle_languages(bundle_path: str) -> List[str]:
+    """Returns the languages of a bundle without loading its probabilities.
+
+    Raises:
+        ValueError: The file is not a profile bundle.
+    """
+    with open(bundle_path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a profile bundle.'.format(bundle_path))
+        return json.loads(f.readline().decode('utf-8'))['languages']
+
+
+def load_bundle(bundle_path: str,
+                languages: Optional[Collection[str]] = None) -> Dict:
+    """Loads a bundle.
+
+    Args:
+        languages: Languages to load. If None, all languages are loaded.
+
+    Returns:
+        A dict with `languages`, the list of language codes, and
+        `word_lang_prob_map`, a `ProbabilityMap`.
+
+    Raises:
+        ValueError: The file is not a profile bundle.
+    """
+    with open(bundle_path, 'rb') as f:
+        data = memoryview(f.read())
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('{} is not a profile bundle.'.format(bundle_path))
+    header_end = bytes(data).index(b'\n', len(MAGIC)) + 1
+    header = json.loads(bytes(data[len(MAGIC):header_end]).decode('utf-8'))
+    start = header_end
+    words = bytes(data[start:start + header['words_bytes']]).decode(
+        'utf-8').split('\0') if header['words'] else []
+    start += header['words_bytes']
+    offsets = read_array('I', data, start, header['words'] + 1)
+    start += offsets.itemsize * len(offsets)
+    language_indices = read_array('B', data, start, header['entries'])
+    start += header['entries']
+    probabilities = read_array('d', data, start, header['entries'])
+    bundle_languages = header['languages']
+    if languages is not None:
+        (bundle_languages, words, offsets, language_indices,
+         probabilities) = select_languages(bundle_languages, words, offsets,
+                                           language_indices, probabilities,
+                                           languages)
+    return {
+        'languages':
+        bundle_languages,
+        'word_lang_prob_map':
+        ProbabilityMap(len(bundle_languages), words, offsets, language_indices,
+                       probabilities),
+    }
+
+
+def install_bundle(langdetect: ModuleType,
+                   bundle_path: str,
+                   languages: Optional[Collection[str]] = None) -> None:
+    """Makes langdetect use the bundle instead of its profile directory.
+
+    Args:
+        languages: Languages that langdetect may detect. If None, all
+          languages in the bundle are candidates.
+    """
+    bundle = load_bundle(bundle_path, languages)
+    factory = langdetect.detector_factory.DetectorFactory()
+    factory.langlist = bundle['languages']
+    factory.word_lang_prob_map = bundle['word_lang_prob_map']
+    langdetect.detector_factory._factory = factory
+
+
+def install_profiles(langdetect: ModuleType, profile_directory: str,
+                     languages: Collection[str]) -> None:
+    """Makes langdetect load only the profiles of the languages.
+
+    Raises:
+        ValueError: Fewer than two of the languages have profiles, which
+          langdetect needs.
+    """
+    selected = [
+        profile for profile in read_profiles(profile_directory)
+        if profile['name'] in languages
+    ]
+    if len(selected) < 2:
+        raise ValueError(
+            'Language detection needs at least two languages with langdetect '
+            'profiles, but the "languages" setting has {}: {}.'.format(
+                len(selected),
+                ', '.join(profile['name'] for profile in selected) or 'none'))
+    factory = langdetect.detector_factory.DetectorFactory()
+    factory.load_json_profile([json.dumps(profile) for profile in selected])
+    langdetect.detector_factory._factory = factory
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        sys.exit('Usage: profiles.py PROFILE_DIRECTORY BUNDLE_PATH')
+    build_bundle(argv[0], argv[1])
+
+
+if __name__ == '__main__':
+    main()
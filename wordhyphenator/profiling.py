@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Opt-in timing of the stages of the hyphenation pipeline.
+
+The profiler accumulates the number of calls, the total time and a histogram
+of durations for each stage, e.g., HTML parsing or language detection. When
+it's disabled, timing a stage costs a single attribute check.
+"""
+import bisect
+import contextlib
+import json
+import threading
+import time
+from typing import ContextManager, Dict, List, Optional
+
+# Upper bounds of histogram buckets in seconds. The last bucket is unbounded.
+BUCKET_BOUNDS = [1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0]
+
+_NOT_TIMED: ContextManager[None] = contextlib.nullcontext()
+
+
+class StageStats:
+    """Statistics of a single stage."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.histogram[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'total_s': self.total,
+            'mean_s': self.mean,
+            'max_s': self.max,
+            'histogram': {
+                bucket_label(i): count
+                for i, count in enumerate(self.histogram)
+            },
+        }
+
+
+def bucket_label(i: int) -> str:
+    if i < len(BUCKET_BOUNDS):
+        return '<={:g}s'.format(BUCKET_BOUNDS[i])
+    return '>{:g}s'.format(BUCKET_BOUNDS[-1])
+
+
+class StageProfiler:
+    """Accumulates timings of pipeline stages across calls and threads."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._stats: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> ContextManager[None]:
+        """Times the enclosed block as the named stage if profiling is on."""
+        if not self.enabled:
+            return _NOT_TIMED
+        return self._timed(name)
+
+    @contextlib.contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = StageStats()
+            stats.add(seconds)
+
+    def get(self, name: str) -> Optional[StageStats]:
+        return self._stats.get(name)
+
+    def stage_names(self) -> List[str]:
+        """Returns the recorded stages by total time, longest first."""
+        with self._lock:
+            return sorted(self._stats,
+                          key=lambda name: self._stats[name].total,
+                          reverse=True)
+
+    def to_dict(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                name: stats.to_dict()
+                for name, stats in sorted(self._stats.items())
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def report(self) -> str:
+        """Formats the statistics as a plain text table."""
+        lines = [
+            '{:24s}{:>10s}{:>12s}{:>12s}{:>12s}'.format(
+                'stage', 'count', 'total ms', 'mean ms', 'max ms')
+        ]
+        for name in self.stage_names():
+            stats = self._stats[name]
+            lines.append('{:24s}{:10d}{:12.1f}{:12.3f}{:12.3f}'.format(
+                name, stats.count, 1e3 * stats.total, 1e3 * stats.mean,
+                1e3 * stats.max))
+        return '\n'.join(lines)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""A streaming HTML engine for the word hyphenator.
+
+The engine is an alternative to building a BeautifulSoup tree for every
+field. It runs the standard library's HTML tokenizer over the field and emits
+markup as it goes, rewriting only text between tags. It skips the
+same nodes as `main.visit_text_nodes`: comments and the contents of <pre>,
+<script> and <style> elements.
+"""
+from html import escape
+from html.parser import HTMLParser
+from typing import Callable, Iterable, Iterator, List
+
+# Elements that never have an end tag, so they are never open.
+VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr'
+])
+
+SKIPPED_ELEMENTS = frozenset(['pre', 'script', 'style'])
+
+# Elements whose contents the tokenizer reports unescaped.
+RAW_TEXT_ELEMENTS = frozenset(['script', 'style'])
+
+
+class TextRewritingParser(HTMLParser):
+    """Tokenizes HTML and rewrites text nodes subject to hyphenation.
+
+    The parser keeps a stack of open elements, so that it knows whether text
+    is inside a skipped element. An end tag closes all elements opened after
+    its matching start tag, the same way BeautifulSoup's `html.parser` tree
+    builder does.
+
+    The tokenizer may report a single text node in several pieces, e.g., 'a',
+    '<', ' b' for 'a < b', so text is buffered until the next non-text token.
+
+    The parser relies only on the tokenizer's public callbacks, which may
+    normalize markup other than start tags, e.g., '</A >' becomes '</a>'.
+    """
+
+    def __init__(self, rewrite: Callable[[str], str]):
+        super().__init__(convert_charrefs=True)
+        self.rewrite = rewrite
+        self.output: List[str] = []
+        self._text: List[str] = []
+        self._open_elements: List[str] = []
+        self._skipped_depth = 0
+
+    def flush(self) -> str:
+        """Returns the output produced so far and clears it.
+
+        Text that may continue in the next chunk is kept back.
+        """
+        output = ''.join(self.output)
+        self.output = []
+        return output
+
+    def close(self):
+        super().close()
+        self._flush_text()
+
+    def _flush_text(self):
+        if not self._text:
+            return
+        text = ''.join(self._text)
+        self._text = []
+        # The contents of <style> and <script> elements arrive unescaped and
+        # must be emitted as such.
+        is_raw = bool(self._open_elements
+                      and self._open_elements[-1] in RAW_TEXT_ELEMENTS)
+        if not self._skipped_depth:
+            text = self.rewrite(text)
+        self.output.append(text if is_raw else escape(text, quote=False))
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        self.output.append(self.get_starttag_text())
+        if tag in VOID_ELEMENTS:
+            return
+        self._open_elements.append(tag)
+        if tag in SKIPPED_ELEMENTS:
+            self._skipped_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush_text()
+        self.output.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        self.output.append('</{}>'.format(tag))
+        if tag not in self._open_elements:
+            return
+        while self._open_elements:
+            closed = self._open_elements.pop()
+            if closed in SKIPPED_ELEMENTS:
+                self._skipped_depth -= 1
+            if closed == tag:
+                break
+
+    def handle_data(self, data):
+        self._text.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+        self.output.append('<!--{}-->'.format(data))
+
+    def handle_decl(self, decl):
+        self._flush_text()
+        self.output.append('<!{}>'.format(decl))
+
+    def handle_pi(self, data):
+        self._flush_text()
+        self.output.append('<?{}>'.format(data))
+
+    def unknown_decl(self, data):
+        self._flush_text()
+        # CDATA sections arrive as 'CDATA[...'.
+        self.output.append('<![{}]]>'.format(data))
+
+
+def hyphenate_html_stream(
+        chunks: Iterable[str], hyphenate_text: Callable[[str],
+                                                        str]) -> Iterator[str]:
+    """Hyphenates an HTML document arriving in chunks.
+
+    Args:
+        hyphenate_text: Hyphenates a single text node.
+
+    Yields:
+        Pieces of the hyphenated document as soon as they are available.
+    """
+    parser = TextRewritingParser(hyphenate_text)
+    for chunk in chunks:
+        parser.feed(chunk)
+        output = parser.flush()
+        if output:
+            yield output
+    parser.close()
+    output = parser.flush()
+    if output:
+        yield output
+
+
+def hyphenate_html(html: str, hyphenate_text: Callable[[str], str]) -> str:
+    """Hyphenates the HTML document.
+
+    Args:
+        hyphenate_text: Hyphenates a single text node.
+
+    Returns:
+        A hyphenated HTML document with markup preserved as is.
+    """
+    return ''.join(hyphenate_html_stream([html], hyphenate_text))
+
+
+def extract_text_nodes(html: str) -> List[str]:
+    """Returns text nodes of the HTML document subject to hyphenation."""
+    texts: List[str] = []
+
+    def collect(text: str) -> str:
+        texts.append(text)
+        return text
+
+    hyphenate_html(html, collect)
+    return texts
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Tools menu actions of the word hyphenator."""
+import aqt  # type: ignore
+from anki.notes import NoteId  # type: ignore
+from aqt import gui_hooks  # type: ignore
+from aqt.qt import (QAction, QDialog, QDialogButtonBox, QFileDialog, QFont,
+                    QMenu, QPlainTextEdit, QPushButton, QVBoxLayout, qconnect)
+from aqt.utils import askUser, askUserDialog, tooltip  # type: ignore
+
+from .main import profiler
+from .operations import collection_op, load_checkpoint
+
+
+class ProfileDialog(QDialog):
+    """Shows how much time each stage of hyphenation has taken."""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setWindowTitle('Hyphenation Profile')
+        self.resize(640, 360)
+        layout = QVBoxLayout(self)
+        self.report = QPlainTextEdit()
+        self.report.setReadOnly(True)
+        font = QFont('monospace')
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        self.report.setFont(font)
+        layout.addWidget(self.report)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        export_button = QPushButton('Export JSON...')
+        reset_button = QPushButton('Reset')
+        buttons.addButton(export_button,
+                          QDialogButtonBox.ButtonRole.ActionRole)
+        buttons.addButton(reset_button, QDialogButtonBox.ButtonRole.ResetRole)
+        qconnect(export_button.clicked, self.export)
+        qconnect(reset_button.clicked, self.reset)
+        qconnect(buttons.rejected, self.reject)
+        layout.addWidget(buttons)
+        self.refresh()
+
+    def refresh(self) -> None:
+        if not profiler.enabled:
+            self.report.setPlainText(
+                'Profiling is off. Set "profiling" to true in the add-on '
+                'configuration and restart Anki to turn it on.')
+            return
+        self.report.setPlainText(profiler.report())
+
+    def export(self) -> None:
+        path, _ = QFileDialog.getSaveFileName(self, 'Export Profile',
+                                              'hyphenation-profile.json',
+                                              'JSON (*.json)')
+        if not path:
+            return
+        with open(path, 'w') as f:
+            f.write(profiler.to_json())
+        tooltip('Exported the profile.', parent=self)
+
+    def reset(self) -> None:
+        profiler.reset()
+        self.refresh()
+
+
+def on_show_profile() -> None:
+    ProfileDialog(aqt.mw).exec()
+
+
+# Collection-wide actions, the jobs that they run and their questions.
+COLLECTION_ACTIONS = [
+    ('Hyphenate All Notes', 'hyphenate',
+     'Hyphenate all notes in the collection?'),
+    ('Remove Hyphenation from All Notes', 'dehyphenate',
+     'Remove hyphenation from all notes in the collection?'),
+    ('Re-hyphenate All Notes', 'rehyphenate',
+     'Remove hyphenation from all notes in the collection and hyphenate them '
+     'again?'),
+]
+
+
+def on_update_all_notes(title: str, job: str, question: str) -> None:
+    profile = aqt.mw.pm.name or ''
+    start_after = load_checkpoint(profile, job)
+    if start_after:
+        choice = askUserDialog(
+            '"{}" was interrupted. Resume where it left off or start '
+            'over?'.format(title), ['Resume', 'Start Over', 'Cancel'],
+            parent=aqt.mw).run()
+        if choice == 'Start Over':
+            start_after = NoteId(0)
+        elif choice != 'Resume':
+            return
+    elif not askUser(
+            question + " This can take a long time and can't be undone. If "
+            "it's interrupted, you can resume it later.",
+            parent=aqt.mw):
+        return
+    collection_op(aqt.mw, job, profile, start_after).run_in_background()
+
+
+def on_main_window_did_init() -> None:
+    menu = QMenu('Word Hyphenator', aqt.mw)
+    for title, job, question in COLLECTION_ACTIONS:
+        action = QAction(title + '...', aqt.mw)
+        # `triggered` passes the `checked` flag. Default arguments bind the
+        # loop variables.
+        qconnect(action.triggered,
+                 lambda _, title=title, job=job, question=question:
+                 on_update_all_notes(title, job, question))
+        menu.addAction(action)
+    menu.addSeparator()
+    profile_action = QAction('Profile...', aqt.mw)
+    qconnect(profile_action.triggered, on_show_profile)
+    menu.addAction(profile_action)
+    aqt.mw.form.menuTools.addSeparator()
+    aqt.mw.form.menuTools.addMenu(menu)
+
+
+gui_hooks.main_window_did_init.append(on_main_window_did_init)